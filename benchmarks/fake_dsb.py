@@ -0,0 +1,89 @@
+"""
+Serve the recorded DSB fixtures to requests without network access.
+
+install() replaces the scraper's shared HTTP session with one whose transport adapter answers
+every request from benchmarks/fixtures/, so the real fetch, cache and parsing code runs
+unchanged.
+"""
+import hashlib
+import io
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+import http_session
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+# DSB app API endpoints and the fixtures answering them
+API_ENDPOINTS = {
+    "/authid": "authid.json",
+    "/dsbdocuments": "dsbdocuments.json",
+}
+
+
+class FixtureAdapter(BaseAdapter):
+    """Transport adapter answering requests with fixture files, including ETag revalidation."""
+
+    def __init__(self, fixtures: Path = FIXTURES):
+        super().__init__()
+        self.fixtures = fixtures
+        self.requests = 0
+
+    def fixture_path(self, url: str) -> Path | None:
+        """Map a request URL to its fixture: API endpoints by path, pages by file name."""
+        path = urlsplit(url).path
+        name = API_ENDPOINTS.get(path, path.rsplit("/", 1)[-1])
+        fixture = self.fixtures / name
+        return fixture if name and fixture.is_file() else None
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None,
+             proxies=None):
+        self.requests += 1
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.headers = CaseInsensitiveDict()
+
+        fixture = self.fixture_path(request.url)
+        if fixture is None:
+            response.status_code = 404
+            response.raw = io.BytesIO(b"")
+            return response
+
+        body = fixture.read_bytes()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        response.headers["ETag"] = etag
+        if request.headers.get("If-None-Match") == etag:
+            response.status_code = 304
+            response.raw = io.BytesIO(b"")
+            return response
+
+        response.status_code = 200
+        response.headers["Content-Type"] = (
+            "application/json" if fixture.suffix == ".json" else "text/html; charset=utf-8")
+        response.headers["Content-Length"] = str(len(body))
+        response.encoding = "utf-8"
+        response.raw = io.BytesIO(body)
+        return response
+
+    def close(self):
+        pass
+
+
+def install(fixtures: Path = FIXTURES) -> FixtureAdapter:
+    """
+    Route the scraper's shared HTTP session to the fixtures.
+
+    Returns:
+        FixtureAdapter: The adapter, e.g. to count the requests it answered.
+    """
+    adapter = FixtureAdapter(fixtures)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    http_session.set_session(session)
+    return adapter
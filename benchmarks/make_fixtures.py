@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Generate the anonymised DSB fixtures in benchmarks/fixtures/.
+
+The files mirror the structure of recorded DSB responses: the /authid token, the /dsbdocuments
+postings, the DaVinci day index and V_DC_*.html day pages. Teachers, rooms and texts are
+replaced by generated values. Output is deterministic, so regenerating the fixtures only changes
+them if this script changes.
+
+Usage: python benchmarks/make_fixtures.py
+"""
+import json
+import random
+from pathlib import Path
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+# Anonymised ids of the DSB account and the DaVinci export
+ACCOUNT_ID = "00000000-0000-4000-8000-000000000000"
+EXPORT_ID = "11111111-1111-4111-8111-111111111111"
+DATA_URL = f"https://light.dsbcontrol.de/DSBlightWebsite/Data/{ACCOUNT_ID}/{EXPORT_ID}/"
+
+# Day pages: (file name, date, weekday, number of table rows)
+DAYS = [
+    ("V_DC_001.html", "02.09.2024", "Montag", 40),
+    ("V_DC_002.html", "03.09.2024", "Dienstag", 200),
+    ("V_DC_003.html", "04.09.2024", "Mittwoch", 1000),
+    ("V_DC_004.html", "05.09.2024", "Donnerstag", 200),
+    ("V_DC_005.html", "06.09.2024", "Freitag", 40),
+]
+
+COURSES = [f"{grade:02d}{letter}" for grade in range(5, 11) for letter in "abcd"] + \
+    ["MSS11", "MSS12", "MSS13"]
+SUBJECTS = ["D", "E", "M", "F", "L", "Ph", "Ch", "Bio", "Ek", "G", "Sk", "Mu", "BK", "Sp", "Rel"]
+INFOS = ["Entfall", "Vertretung", "Raumänderung", "Verlegung", "Aufgaben", "", ""]
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="de">
+<head>
+<meta charset="utf-8">
+<title>DaVinci Touch - {weekday}, {date}</title>
+<link rel="stylesheet" href="../../davinci.css">
+</head>
+<body>
+<div class="header"><h1>Vertretungsplan</h1><span class="date">{weekday}, {date}</span></div>
+<div class="info"><p>Stand: {date} 07:15</p></div>
+<table class="table table-striped">
+<thead>
+<tr><th>Klasse</th><th>Stunde</th><th>Lehrer</th><th>Fach</th><th>Raum</th><th>Thema</th><th>Info</th></tr>
+</thead>
+<tbody>
+{rows}
+</tbody>
+</table>
+<div class="footer">DaVinci 6 - Stundenplan-Export</div>
+</body>
+</html>
+"""
+
+
+def teacher(rng: random.Random) -> str:
+    """Return an anonymised teacher abbreviation, sometimes as a substitution."""
+    name = "".join(rng.choice("ABCDEFGHKLMNPRSTWZ") for _ in range(3))
+    if rng.random() < 0.3:
+        substitute = "".join(rng.choice("ABCDEFGHKLMNPRSTWZ") for _ in range(3))
+        return f"<s>{name}</s>&rarr;{substitute}"
+    return f"({name})"
+
+
+def day_rows(rng: random.Random, count: int) -> list[str]:
+    """Return `count` table rows in one block per course, as on DaVinci day pages."""
+    # Split the rows randomly between the courses, at least one row each
+    sizes = [1] * len(COURSES)
+    for _ in range(count - len(COURSES)):
+        sizes[rng.randrange(len(COURSES))] += 1
+
+    rows: list[str] = []
+    for course, size in zip(COURSES, sizes):
+        position = rng.randint(1, 6)
+        for index in range(size):
+            cells = [
+                course if index == 0 else "&nbsp;",
+                "" if index and rng.random() < 0.2 else f"{position + index}.",
+                teacher(rng),
+                rng.choice(SUBJECTS),
+                str(rng.randint(100, 350)),
+                rng.choice(["", "", "Kapitel 4", "Arbeitsblatt"]),
+                rng.choice(INFOS),
+            ]
+            rows.append("<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>")
+    return rows
+
+
+def main() -> None:
+    """Write all fixtures."""
+    rng = random.Random(2024)
+    FIXTURES.mkdir(exist_ok=True)
+
+    (FIXTURES / "authid.json").write_text(json.dumps(ACCOUNT_ID) + "\n", encoding="utf-8")
+
+    documents = [{
+        "Id": ACCOUNT_ID,
+        "Date": "02.09.2024 07:15",
+        "Title": "Vertretungspläne",
+        "Detail": "",
+        "Tags": "",
+        "ConType": 1,
+        "Prio": 0,
+        "Index": 0,
+        "Childs": [{
+            "Id": EXPORT_ID,
+            "Date": "02.09.2024 07:15",
+            "Title": "DaVinci Touch",
+            "Detail": DATA_URL + "index.html",
+            "Tags": "",
+            "ConType": 6,
+            "Prio": 0,
+            "Index": 0,
+            "Childs": [],
+            "Preview": f"{ACCOUNT_ID}/preview.png",
+        }],
+        "Preview": "",
+    }]
+    (FIXTURES / "dsbdocuments.json").write_text(
+        json.dumps(documents, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+    links = "\n".join(f'<li><a href="{name}">{date} {weekday}</a></li>'
+                      for name, date, weekday, _ in DAYS)
+    (FIXTURES / "index.html").write_text(
+        "<!DOCTYPE html>\n<html lang=\"de\">\n<head><meta charset=\"utf-8\">"
+        "<title>DaVinci Touch</title></head>\n<body>\n<div class=\"days\">\n"
+        f"<ul class=\"day-index\">\n{links}\n</ul>\n</div>\n</body>\n</html>\n",
+        encoding="utf-8")
+
+    for name, date, weekday, count in DAYS:
+        page = PAGE_TEMPLATE.format(weekday=weekday, date=date,
+                                    rows="\n".join(day_rows(rng, count)))
+        (FIXTURES / name).write_text(page, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the DSB mobile API and the DaVinci plan pages.
+
+Serves the fixtures from benchmarks/fixtures/ (or generated plans of any size) over HTTP, with
+injectable latency, error rates and slow bodies, so concurrency, timeouts and retries can be
+tested offline. Point the scraper at it with DSB_API_URL:
+
+    python benchmarks/mock_dsb.py --port 8081 --latency 200 --error-rate 0.1
+    DSB_API_URL=http://127.0.0.1:8081 DSB_USERNAME=user DSB_PASSWORD=pass python src/runner.py
+
+The postings returned by /dsbdocuments link to the plan pages on this server. Request counts per
+path and status are available at /_stats.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+
+from aiohttp import web
+
+import make_fixtures
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+WEEKDAYS = ["Montag", "Dienstag", "Mittwoch", "Donnerstag", "Freitag"]
+
+# Passwords rejected by /authid, to test invalid credentials
+INVALID_PASSWORD = "invalid"
+
+
+class MockDSB:
+    """The state and request handlers of the stand-in server."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.tokens: set[str] = set()
+        self.stats: Counter = Counter()
+        self.pages = self.build_pages()
+
+    def build_pages(self) -> dict[str, bytes]:
+        """Return the plan pages by file name: the recorded fixtures or generated ones."""
+        if not self.args.rows:
+            return {path.name: path.read_bytes() for path in FIXTURES.glob("*.html")}
+
+        pages = {}
+        links = []
+        day = date(2024, 9, 2)
+        for number in range(1, self.args.days + 1):
+            while day.weekday() > 4:
+                day += timedelta(days=1)
+            name = f"V_DC_{number:03d}.html"
+            weekday, day_text = WEEKDAYS[day.weekday()], day.strftime("%d.%m.%Y")
+            rows = make_fixtures.day_rows(self.rng, self.args.rows)
+            pages[name] = make_fixtures.PAGE_TEMPLATE.format(
+                weekday=weekday, date=day_text, rows="\n".join(rows)).encode("utf-8")
+            links.append(f'<li><a href="{name}">{day_text} {weekday}</a></li>')
+            day += timedelta(days=1)
+
+        pages["index.html"] = (
+            "<!DOCTYPE html>\n<html><body>\n<ul class=\"day-index\">\n" + "\n".join(links) +
+            "\n</ul>\n</body></html>\n").encode("utf-8")
+        return pages
+
+    @web.middleware
+    async def inject_faults(self, request: web.Request, handler) -> web.StreamResponse:
+        """Delay requests and fail a share of them, as configured."""
+        if request.path == "/_stats":
+            return await handler(request)
+
+        delay = self.args.latency + self.rng.uniform(0, self.args.jitter)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+        if self.rng.random() < self.args.error_rate:
+            response = web.Response(status=self.args.error_status, text="injected error")
+        else:
+            response = await handler(request)
+        self.stats[f"{request.path} {response.status}"] += 1
+        return response
+
+    async def authid(self, request: web.Request) -> web.Response:
+        """Return a new token, or an empty string for rejected credentials like the real API."""
+        if not request.query.get("user") or request.query.get("password") == INVALID_PASSWORD:
+            return web.Response(text='""', content_type="application/json")
+        token = str(uuid.UUID(int=self.rng.getrandbits(128)))
+        self.tokens.add(token)
+        return web.Response(text=json.dumps(token), content_type="application/json")
+
+    def authorized(self, request: web.Request) -> bool:
+        """Check the token of a list request."""
+        return request.query.get("authid") in self.tokens
+
+    async def documents(self, request: web.Request) -> web.Response:
+        """Return the postings, linking the DaVinci Touch plan to this server."""
+        if not self.authorized(request):
+            return web.json_response({"Message": "Authorization has been denied."}, status=401)
+
+        postings = json.loads((FIXTURES / "dsbdocuments.json").read_text(encoding="utf-8"))
+        for posting in postings:
+            for child in posting["Childs"]:
+                child["Detail"] = f"{request.url.origin()}/data/index.html"
+        return web.json_response(postings)
+
+    async def empty_list(self, request: web.Request) -> web.Response:
+        """Return an empty list for the other list endpoints."""
+        if not self.authorized(request):
+            return web.json_response({"Message": "Authorization has been denied."}, status=401)
+        return web.json_response([])
+
+    async def page(self, request: web.Request) -> web.StreamResponse:
+        """Serve a plan page with ETag revalidation, optionally trickling the body."""
+        body = self.pages.get(request.match_info["name"])
+        if body is None:
+            raise web.HTTPNotFound()
+
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+
+        headers = {"ETag": etag, "Content-Type": "text/html; charset=utf-8"}
+        if not self.args.slow_body:
+            return web.Response(body=body, headers=headers)
+
+        # Send the body in ten chunks per second at the configured rate
+        response = web.StreamResponse(headers=headers)
+        response.content_length = len(body)
+        await response.prepare(request)
+        chunk_size = max(1, self.args.slow_body // 10)
+        for start in range(0, len(body), chunk_size):
+            await response.write(body[start:start + chunk_size])
+            await asyncio.sleep(0.1)
+        await response.write_eof()
+        return response
+
+    async def stats_handler(self, request: web.Request) -> web.Response:  # pylint: disable=unused-argument
+        """Return the request counts per path and status."""
+        return web.json_response(dict(self.stats))
+
+    def create_app(self) -> web.Application:
+        """Create the aiohttp application."""
+        app = web.Application(middlewares=[self.inject_faults])
+        app.router.add_get("/authid", self.authid)
+        app.router.add_get("/dsbdocuments", self.documents)
+        app.router.add_get("/dsbtimetables", self.empty_list)
+        app.router.add_get("/newstab", self.empty_list)
+        app.router.add_get("/data/{name}", self.page)
+        app.router.add_get("/_stats", self.stats_handler)
+        return app
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Serve DSB fixtures locally.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0,
+                        help="Delay of every response in milliseconds")
+    parser.add_argument("--jitter", type=float, default=0,
+                        help="Random extra delay of up to this many milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0,
+                        help="Share of requests answered with --error-status, 0 to 1")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--slow-body", type=int, default=0,
+                        help="Send plan pages at this many bytes per second")
+    parser.add_argument("--rows", type=int, default=0,
+                        help="Generate plan pages with this many rows instead of the fixtures")
+    parser.add_argument("--days", type=int, default=5,
+                        help="Number of generated plan pages, with --rows")
+    parser.add_argument("--seed", type=int, default=2024)
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Run the server until interrupted."""
+    args = parse_args()
+    web.run_app(MockDSB(args).create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
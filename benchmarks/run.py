@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the scrape cycle and the API.
+
+Every benchmark runs the real code against the recorded fixtures in benchmarks/fixtures/ (see
+fake_dsb.py), so results do not depend on the network or on the live plans. Each benchmark
+reports the mean and best time over several runs and the peak memory allocated by one run.
+
+Usage:
+    python benchmarks/run.py                        # run everything
+    python benchmarks/run.py -k scraping -n 20      # only matching benchmarks, 20 runs each
+    python benchmarks/run.py --parser bs4 --json-backend json
+    python benchmarks/run.py -o before.json         # save results ...
+    python benchmarks/run.py --compare before.json  # ... and compare a later run against them
+    python benchmarks/run.py --check                # check parser backends and cache recovery
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+# Keep the benchmarks from writing to the history database in json/
+os.environ["DSB_HISTORY_DB"] = ""
+
+# pylint: disable=wrong-import-position
+from rich.console import Console
+from rich.table import Table
+
+import fake_dsb
+import format_json
+import make_fixtures
+import json_io
+import schema
+import scraper
+import table_parser
+
+SCHEMA_FILE = str(ROOT / "schema" / "schema.json")
+CREDENTIALS: dict[str, str | None] = {"DSB_USERNAME": "benchmark", "DSB_PASSWORD": "benchmark"}
+COURSE = "MSS12"
+
+# Regressions beyond this factor are highlighted by --compare
+REGRESSION_THRESHOLD = 1.10
+
+# Cells on which parser backends tend to differ, checked by --check next to the fixtures
+EDGE_CASE_PAGE = make_fixtures.PAGE_TEMPLATE.format(weekday="Montag", date="02.09.2024", rows="""
+<tr><td>MSS12</td><td> 1. </td><td>
+  (ABC)
+</td><td>M</td><td>\t101\t</td><td></td><td>Entfall</td></tr>
+<tr><td>&nbsp;</td><td>2.</td><td><s>DEF</s>&rarr;GHK</td><td> </td><td>&nbsp;</td><td/><td>A &amp; B</td></tr>
+<tr><td>&nbsp;&nbsp;</td><td><b>3.</b>-<i>4.</i></td><td><!-- comment -->XYZ</td><td>Ph</td>
+<td>2&nbsp;01</td><td>Kapitel&nbsp;4</td><td>Raum&#228;nderung &lt;neu&gt;</td></tr>
+<tr><td>10a</td></tr>
+<tr></tr>
+""").encode("utf-8")
+
+
+@dataclass
+class Result:
+    """The measurements of one benchmark."""
+    name: str
+    runs: int
+    mean_ms: float
+    best_ms: float
+    peak_kib: float
+
+
+@dataclass
+class Benchmark:
+    """A function to measure, with an optional setup that runs untimed before every call."""
+    name: str
+    func: Callable[[], object]
+    setup: Callable[[], object] | None = None
+
+
+def measure(benchmark: Benchmark, repeat: int) -> Result:
+    """Time a benchmark `repeat` times, then trace the peak memory of one more run."""
+    timings = []
+    for _ in range(repeat):
+        if benchmark.setup:
+            benchmark.setup()
+        start = time.perf_counter()
+        benchmark.func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    if benchmark.setup:
+        benchmark.setup()
+    tracemalloc.start()
+    benchmark.func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return Result(benchmark.name, repeat, statistics.mean(timings), min(timings), peak / 1024)
+
+
+def cold() -> None:
+    """Forget cached pages and tokens, so the next call fetches and parses everything again."""
+    scraper.HTTP_CACHE.invalidate()
+    scraper.DISCOVERY_CACHE.invalidate()
+    scraper.TOKEN_CACHE.invalidate(CREDENTIALS["DSB_USERNAME"])  # type: ignore
+
+
+def scraping_benchmarks() -> list[Benchmark]:
+    """Benchmarks of discovery, fetching and parsing."""
+    cold()
+    base_url = scraper.prepare_api_url(CREDENTIALS)
+    posts_dict = scraper.get_plans(base_url)
+    pages = {url.rsplit("/", 1)[-1]: url for url in posts_dict.values()}
+
+    benchmarks = [
+        Benchmark("prepare_api_url (authid + dsbdocuments)",
+                  lambda: scraper.prepare_api_url(CREDENTIALS), cold),
+        Benchmark("get_plans (day index)", lambda: scraper.get_plans(base_url), cold),
+    ]
+    for name in ("V_DC_001.html", "V_DC_002.html", "V_DC_003.html"):
+        url = pages[name]
+        rows = (fake_dsb.FIXTURES / name).read_bytes().count(b"<tr>") - 1
+        benchmarks += [
+            Benchmark(f"main_scraping {rows} rows",
+                      lambda url=url: scraper.main_scraping(url, COURSE), cold),
+            Benchmark(f"main_scraping {rows} rows, stream",
+                      lambda url=url: scraper.main_scraping(url, COURSE, stream=True), cold),
+        ]
+    benchmarks += [
+        Benchmark("main_scraping 1000 rows, unchanged (304)",
+                  lambda: scraper.main_scraping(pages["V_DC_003.html"], COURSE)),
+        Benchmark("main_scraping 1000 rows, stream, unchanged (304)",
+                  lambda: scraper.main_scraping(pages["V_DC_003.html"], COURSE, stream=True)),
+        Benchmark("run_main_scraping 5 days, 1 worker",
+                  lambda: scraper.run_main_scraping(posts_dict, COURSE, False, 1), cold),
+        Benchmark("run_main_scraping 5 days, 4 workers",
+                  lambda: scraper.run_main_scraping(posts_dict, COURSE, False, 4), cold),
+        Benchmark("run_multi_course_scraping 5 days, all courses",
+                  lambda: scraper.run_multi_course_scraping(posts_dict, None, False, 4), cold),
+    ]
+    return benchmarks
+
+
+def all_courses_document(posts_dict: dict[str, str]) -> dict:
+    """Format the plans of every course into one large document, as a worst case."""
+    cold()
+    course_dict = scraper.run_multi_course_scraping(posts_dict, None, False, 4)
+    merged: dict[str, list[list[str]]] = {}
+    for days in course_dict.values():
+        for day, rows in days.items():
+            merged.setdefault(day, []).extend(rows)
+    return format_json.fill_json_template(merged, "all")
+
+
+def processing_benchmarks() -> list[Benchmark]:
+    """Benchmarks of formatting, validation and serialization."""
+    cold()
+    posts_dict = scraper.get_plans(scraper.prepare_api_url(CREDENTIALS))
+    raw = scraper.run_main_scraping(posts_dict, COURSE, False, 4)
+    document = all_courses_document(posts_dict)
+    entries = sum(len(day["content"]) for day in document["substitution"])
+    raw_all = {
+        f"{day['weekDay'][1]}_{day['date']}": [
+            ["", entry["position"], entry["teacher"], entry["subject"], entry["room"],
+             entry["topic"], entry["info"]]
+            for entry in day["content"]]
+        for day in document["substitution"]
+    }
+
+    changed = copy.deepcopy(document)
+    changed["substitution"][0]["content"][0]["room"] = "999"
+    validator = schema.load_validator(SCHEMA_FILE)
+    with open(SCHEMA_FILE, "r", encoding="utf-8") as file:
+        raw_schema = json.load(file)
+
+    import jsonschema  # pylint: disable=import-outside-toplevel
+
+    return [
+        Benchmark(f"fill_json_template {COURSE}",
+                  lambda: format_json.fill_json_template(raw, COURSE)),
+        Benchmark(f"fill_json_template {entries} entries",
+                  lambda: format_json.fill_json_template(raw_all, "all")),
+        Benchmark(f"jsonschema.validate {entries} entries (uncached)",
+                  lambda: jsonschema.validate(document, raw_schema)),
+        Benchmark(f"schema validation {entries} entries",
+                  lambda: list(validator.iter_errors(document))),
+        Benchmark(f"schema validation {entries} entries, 1 day changed",
+                  lambda: list(validator.iter_errors(changed, document))),
+        Benchmark(f"json_io.dumps {entries} entries",
+                  lambda: json_io.dumps(document)),
+        Benchmark(f"json_io.dumps {entries} entries, pretty",
+                  lambda: json_io.dumps(document, pretty=True)),
+        Benchmark(f"json_io.loads {entries} entries",
+                  lambda: json_io.loads(json_io.dumps(document))),
+    ]
+
+
+def api_benchmarks() -> list[Benchmark]:
+    """Benchmarks of API requests, served from the in-memory store."""
+    import app  # pylint: disable=import-outside-toplevel
+
+    cold()
+    posts_dict = scraper.get_plans(scraper.prepare_api_url(CREDENTIALS))
+    document = all_courses_document(posts_dict)
+    client = app.app.test_client()
+    token = client.post("/login", data={"username": "274583", "password": "johann"}).json
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+    gzip_headers = {**headers, "Accept-Encoding": "gzip"}
+
+    def publish():
+        # A new version, so the first request serializes and compresses again
+        app.store.publish(copy.deepcopy(document))
+
+    def get(path: str, request_headers: dict) -> Callable[[], object]:
+        def request():
+            response = client.get(path, headers=request_headers)
+            assert response.status_code in (200, 304), (path, response.status_code)
+        return request
+
+    etag = client.get("/api/", headers=headers).headers.get("ETag", "")
+    conditional = {**headers, "If-None-Match": etag}
+    return [
+        Benchmark("api publish new version (index build)", publish),
+        Benchmark("GET /api/ first request of a version", get("/api/", headers), publish),
+        Benchmark("GET /api/", get("/api/", headers)),
+        Benchmark("GET /api/ gzip", get("/api/", gzip_headers)),
+        Benchmark("GET /api/ If-None-Match (304)", get("/api/", conditional)),
+        Benchmark("GET /api/2/", get("/api/2/", headers)),
+        Benchmark("GET /api/search?teacher=&weekday=",
+                  get("/api/search?subject=M&weekday=Montag", headers)),
+        Benchmark("GET /api/healthcheck", get("/api/healthcheck", {})),
+    ]
+
+
+SUITES: dict[str, Callable[[], list[Benchmark]]] = {
+    "scraping": scraping_benchmarks,
+    "processing": processing_benchmarks,
+    "api": api_benchmarks,
+}
+
+
+def check_parsers() -> list[str]:
+    """
+    Parse the fixtures and EDGE_CASE_PAGE with every parser backend and the streaming parser.
+
+    Returns:
+        list[str]: A description of every page on which a backend differs from bs4.
+    """
+    pages = {path.name: path.read_bytes()
+             for path in sorted(fake_dsb.FIXTURES.glob("V_DC_*.html"))}
+    pages["edge cases"] = EDGE_CASE_PAGE
+
+    failures = []
+    for name, content in pages.items():
+        expected = table_parser.parse_table_bs4(content)
+        results = {backend: parse(content) for backend, parse in table_parser.BACKENDS.items()}
+        # Small chunks split tags, entities and multi-byte characters
+        results["stream"] = list(table_parser.iter_table_rows(
+            content[i:i + 7] for i in range(0, len(content), 7)))
+        for backend, rows in results.items():
+            if rows != expected:
+                row = next((i for i, (a, b) in enumerate(zip(rows or [], expected or []))
+                            if a != b), min(len(rows or []), len(expected or [])))
+                failures.append(f"{name}: {backend} differs from bs4 in row {row}")
+    return failures
+
+
+def check_stale_index() -> list[str]:
+    """
+    Scrape with a cached day index whose day pages are all gone, as after the days roll over.
+
+    The scrape has to discover the index again and succeed within the same cycle.
+
+    Returns:
+        list[str]: A description of the failure, if any.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        fixtures = Path(directory)
+        for path in fake_dsb.FIXTURES.iterdir():
+            shutil.copy(path, fixtures)
+        # An index page listing day pages that no longer exist
+        index = (fixtures / "index.html").read_text(encoding="utf-8")
+        (fixtures / "old.html").write_text(index.replace("V_DC_", "V_OLD_"), encoding="utf-8")
+        fake_dsb.install(fixtures)
+
+        old_url = scraper.prepare_api_url(CREDENTIALS).replace("index.html", "old.html")
+        scraper.DISCOVERY_CACHE.store(old_url, scraper.get_plans(old_url), None)
+        # The failing day pages are expected
+        previous = logging.root.manager.disable
+        logging.disable(logging.ERROR)
+        try:
+            course = scraper.scrape_plans(
+                CREDENTIALS, lambda posts_dict: scraper.run_main_scraping(posts_dict, COURSE, False))
+        except scraper.ScrapeError as e:
+            return [f"stale day index: not discovered again ({e})"]
+        finally:
+            logging.disable(previous)
+            scraper.DISCOVERY_CACHE.invalidate()
+
+    if not any(course.values()):
+        return [f"stale day index: no rows of {COURSE} after discovering it again"]
+    return []
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("-n", "--repeat", type=int, default=10,
+                        help="Timed runs per benchmark. Default: 10")
+    parser.add_argument("-k", "--filter", type=str, default=None,
+                        help="Only run benchmarks whose suite or name contains this text")
+    parser.add_argument("--parser", type=str, default=None,
+                        help=f"Table parser backend: {', '.join(table_parser.BACKENDS)}")
+    parser.add_argument("--json-backend", choices=("orjson", "json"), default=None,
+                        help="JSON serializer backend")
+    parser.add_argument("-o", "--output", type=str, default=None,
+                        help="Save the results as JSON")
+    parser.add_argument("--compare", type=str, default=None,
+                        help="Compare against results saved with --output")
+    parser.add_argument("--check", action="store_true",
+                        help="Only check that all parser backends return identical rows and "
+                        "that a stale cached day index is discovered again")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Run the selected benchmarks and print a report."""
+    args = parse_args()
+    logging.disable(logging.WARNING)
+
+    if args.parser:
+        table_parser.parse_table = table_parser.get_backend(args.parser)
+    if args.json_backend:
+        if args.json_backend == "orjson" and json_io.orjson is None:
+            sys.exit("orjson is not installed")
+        json_io.BACKEND = args.json_backend
+
+    if args.check:
+        failures = check_parsers() + check_stale_index()
+        for failure in failures:
+            print(failure)
+        checks = ", ".join([*table_parser.BACKENDS, "stream", "stale day index"])
+        print(f"{'FAILED' if failures else 'OK'}: {checks}")
+        sys.exit(1 if failures else 0)
+
+    adapter = fake_dsb.install()
+    baseline = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = {result["name"]: result for result in json.load(file)["results"]}
+
+    console = Console()
+    table = Table(title="DSBMobile benchmarks")
+    for column in ("suite", "benchmark", "mean ms", "best ms", "ops/s", "peak KiB"):
+        table.add_column(column, justify="left" if column in ("suite", "benchmark") else "right")
+    if baseline:
+        table.add_column("vs. baseline", justify="right")
+
+    results = []
+    for suite, make_benchmarks in SUITES.items():
+        for benchmark in make_benchmarks():
+            if args.filter and args.filter not in suite and args.filter not in benchmark.name:
+                continue
+            result = measure(benchmark, args.repeat)
+            results.append(result)
+
+            row = [suite, result.name, f"{result.mean_ms:.2f}", f"{result.best_ms:.2f}",
+                   f"{1000 / result.mean_ms:,.0f}" if result.mean_ms else "-",
+                   f"{result.peak_kib:,.0f}"]
+            if baseline:
+                before = baseline.get(result.name)
+                if before:
+                    ratio = result.mean_ms / before["mean_ms"]
+                    style = "red" if ratio > REGRESSION_THRESHOLD else "green"
+                    row.append(f"[{style}]{(ratio - 1) * 100:+.0f}%[/{style}]")
+                else:
+                    row.append("new")
+            table.add_row(*row)
+
+    console.print(table)
+    console.print(f"parser: {table_parser.parse_table.__name__}, json: {json_io.BACKEND}, "
+                  f"fixture requests: {adapter.requests}")
+
+    if args.output:
+        report = {
+            "python": platform.python_version(),
+            "parser": table_parser.parse_table.__name__,
+            "json_backend": json_io.BACKEND,
+            "repeat": args.repeat,
+            "results": [asdict(result) for result in results],
+        }
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
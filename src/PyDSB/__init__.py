@@ -5,15 +5,109 @@ PyDSB Module
 This module provides classes and methods for interacting with DSB mobile API.
 """
 
+import json
 import logging
-import sys
+import os
+import re
+import threading
+import time
 import requests
 
-BASE_URL = "https://mobileapi.dsbcontrol.de"
+# Override the hosts with DSB_API_URL and DSB_PREVIEW_URL, e.g. to use a local stand-in server
+BASE_URL = os.getenv("DSB_API_URL", "https://mobileapi.dsbcontrol.de").rstrip("/")
+PREVIEW_URL_BASE = os.getenv("DSB_PREVIEW_URL", "https://light.dsbcontrol.de/DSBlightWebsite/Data/")
+TOKEN_TTL = 3600
+TIMEOUT = 10
+
+# Tokens are GUIDs; rejected credentials get an empty string or the zero GUID
+TOKEN_PATTERN = re.compile(r"[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}")
+REJECTED_TOKENS = {"", "00000000-0000-0000-0000-000000000000"}
 
 logger = logging.getLogger(__name__)
 
 
+class PyDSBError(Exception):
+    """Raised when the DSB mobile API returns an unusable response."""
+
+
+class InvalidCredentialsError(PyDSBError):
+    """Raised when the DSB mobile API rejects the username or password."""
+
+
+class TokenCache:
+    """
+    A cache of authentication tokens per username.
+
+    Tokens are kept in memory and, if a path is given, in a JSON file so they survive restarts.
+    A cached token is used until its TTL expires or the API rejects it.
+
+    Attributes:
+        path (str | None): Path of the JSON file the tokens are persisted to.
+        ttl (float): Seconds a token is reused before a new one is requested.
+    """
+
+    def __init__(self, path: str | None = None, ttl: float = TOKEN_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tokens: dict[str, dict] = self._load()
+
+    def _load(self) -> dict[str, dict]:
+        if not self.path:
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                tokens = json.load(file)
+            return tokens if isinstance(tokens, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        try:
+            # Tokens grant access to the account, so keep the file private
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, "w", encoding="utf-8") as file:
+                json.dump(self._tokens, file)
+        except OSError as e:
+            logger.warning("PyDSB: Could not write token cache %s: %s", self.path, e)
+
+    def get(self, username: str) -> str | None:
+        """
+        Return the cached token for the given user if it has not expired.
+
+        :param username: Username the token was issued for.
+        :return: The token, or None if there is no valid token.
+        """
+        with self._lock:
+            entry = self._tokens.get(username)
+            if entry and entry.get("token") and entry.get("expires_at", 0) > time.time():
+                return entry["token"]
+            return None
+
+    def set(self, username: str, token: str) -> None:
+        """
+        Store a freshly issued token.
+
+        :param username: Username the token was issued for.
+        :param token: The authentication token.
+        """
+        with self._lock:
+            self._tokens[username] = {"token": token, "expires_at": time.time() + self.ttl}
+            self._save()
+
+    def invalidate(self, username: str) -> None:
+        """
+        Forget the token of the given user.
+
+        :param username: Username the token was issued for.
+        """
+        with self._lock:
+            if self._tokens.pop(username, None) is not None:
+                self._save()
+
+
 class PyDSB:
     """
     A class to interact with the DSB mobile API.
@@ -23,9 +117,11 @@ class PyDSB:
 
     Attributes:
         token (str): Authentication token obtained after successful authentication.
+        session (requests.Session): Session used for all requests to the API.
+        token_cache (TokenCache | None): Cache the token is read from and stored in.
 
     Methods:
-        __init__(self, username: str = None, password: str = None):
+        __init__(self, username: str = None, password: str = None, session=None, token_cache=None):
             Initializes the PyDSB instance with username and password to authenticate with the API.
 
         get_plans(self) -> list:
@@ -38,30 +134,106 @@ class PyDSB:
             Retrieves the list of postings (documents) available for the authenticated user.
     """
 
-    def __init__(self, username: str = None, password: str = None): # type: ignore
+    def __init__(self, username: str = None, password: str = None,  # type: ignore
+                 session: requests.Session | None = None, token_cache: TokenCache | None = None,
+                 base_url: str | None = None, timeout: float = TIMEOUT):
         """
         Initialize PyDSB with username and password to authenticate and obtain a token.
 
+        If a token cache is given and holds a valid token for the user, no request is sent.
+
         :param username: Username for DSB authentication.
         :param password: Password for DSB authentication.
+        :param session: Session used for all requests, so connections can be pooled and reused.
+            A new session is created if omitted.
+        :param token_cache: Cache to reuse tokens from across instances and restarts.
+        :param base_url: URL of the DSB mobile API. Defaults to BASE_URL.
+        :param timeout: Timeout of each request in seconds.
+        :raises InvalidCredentialsError: If the credentials are rejected.
+        :raises PyDSBError: If the API does not answer with a token.
+        """
+        self.session = session if session is not None else requests.Session()
+        self.base_url = (base_url or BASE_URL).rstrip("/")
+        self.timeout = timeout
+        self.token_cache = token_cache
+        self._username = username or ""
+        self._password = password
+
+        cached_token = token_cache.get(self._username) if token_cache else None
+        self.token = cached_token or self._authenticate()
+
+    def _authenticate(self) -> str:
+        """
+        Request a new token from the API and store it in the token cache.
+
+        :return: The new token.
+        :raises InvalidCredentialsError: If the credentials are rejected.
+        :raises PyDSBError: If the API answers with an error status or the response is not a
+            token, e.g. an error page of a proxy. Nothing is cached in that case.
         """
         params = {
             "bundleid": "de.heinekingmedia.dsbmobile",
             "appversion": "35",
             "osversion": "22",
             "pushid": "",
-            "user": username,
-            "password": password
+            "user": self._username,
+            "password": self._password
         }
 
-        r = requests.get(BASE_URL + "/authid", params=params, timeout=10)
+        r = self.session.get(self.base_url + "/authid", params=params, timeout=self.timeout)
+        try:
+            r.raise_for_status()
+        except requests.HTTPError:
+            # The error message would contain the URL, including the password
+            raise PyDSBError(f"/authid returned HTTP {r.status_code}") from None
 
-        if r.text == "\"\"":  # Me when http status code is always 200 :trollface:
+        try:
+            token = r.json()
+        except ValueError:
+            token = None
+        if not isinstance(token, str):
+            raise PyDSBError(f"/authid returned no token: {r.text[:100]!r}")
+
+        if token in REJECTED_TOKENS:  # Me when http status code is always 200 :trollface:
             logger.critical("PyDSB: Invalid Credentials!")
-            sys.exit(1)
-            # raise Exception("Invalid Credentials")
-        else:
-            self.token = r.text.replace("\"", "")
+            raise InvalidCredentialsError("Invalid Credentials")
+
+        if not TOKEN_PATTERN.fullmatch(token):
+            raise PyDSBError(f"/authid returned no token: {token[:100]!r}")
+
+        if self.token_cache:
+            self.token_cache.set(self._username, token)
+        return token
+
+    def _get_list(self, endpoint: str) -> list:
+        """
+        Fetch a list endpoint, re-authenticating once if the token was rejected.
+
+        The API answers requests with an expired token with an error status or a body that is
+        not a JSON list.
+
+        :param endpoint: Path of the endpoint, e.g. "/dsbtimetables".
+        :return: The decoded JSON list.
+        :raises PyDSBError: If the API still rejects the request after re-authentication.
+        """
+        for attempt in range(2):
+            if not self.token or attempt:
+                if self.token_cache:
+                    self.token_cache.invalidate(self._username)
+                self.token = self._authenticate()
+
+            r = self.session.get(self.base_url + endpoint, params={"authid": self.token},
+                                 timeout=self.timeout)
+            try:
+                data = r.json() if r.ok else None
+            except ValueError:
+                data = None
+            if isinstance(data, list):
+                return data
+
+            logger.info("PyDSB: %s rejected the token (HTTP %s)", endpoint, r.status_code)
+
+        raise PyDSBError(f"{endpoint} did not return a list after re-authentication")
 
     def get_plans(self) -> list:
         """
@@ -69,10 +241,8 @@ class PyDSB:
 
         :return: List of dictionaries representing plans.
         """
-        raw_plans = requests.get(BASE_URL + "/dsbtimetables",
-                                 params={"authid": self.token}, timeout=10).json()
+        raw_plans = self._get_list("/dsbtimetables")
         plans = []
-        preview_url_base: str = "https://light.dsbcontrol.de/DSBlightWebsite/Data/"
 
         for plan in raw_plans:
             for i in plan["Childs"]:
@@ -82,7 +252,7 @@ class PyDSB:
                     "uploaded_date": i["Date"],
                     "title": i["Title"],
                     "url": i["Detail"],
-                    "preview_url": f"{preview_url_base}{i['Preview']}",
+                    "preview_url": f"{PREVIEW_URL_BASE}{i['Preview']}",
                 })
 
         return plans
@@ -93,8 +263,7 @@ class PyDSB:
 
         :return: List of dictionaries representing news items.
         """
-        raw_news = requests.get(BASE_URL + "/newstab",
-                                params={"authid": self.token}, timeout=10).json()
+        raw_news = self._get_list("/newstab")
         news = []
 
         for i in raw_news:
@@ -110,10 +279,8 @@ class PyDSB:
 
         :return: List of dictionaries representing postings.
         """
-        raw_postings = requests.get(BASE_URL + "/dsbdocuments",
-                                    params={"authid": self.token}, timeout=10).json()
+        raw_postings = self._get_list("/dsbdocuments")
         postings = []
-        preview_url_base: str = "https://light.dsbcontrol.de/DSBlightWebsite/Data/"
 
         for posting in raw_postings:
             for i in posting["Childs"]:
@@ -122,7 +289,7 @@ class PyDSB:
                     "uploaded_date": i["Date"],
                     "title": i["Title"],
                     "url": i["Detail"],
-                    "preview_url": f"{preview_url_base}{i['Preview']}",
+                    "preview_url": f"{PREVIEW_URL_BASE}{i['Preview']}",
                 })
 
         return postings
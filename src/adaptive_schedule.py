@@ -0,0 +1,182 @@
+"""
+Adaptive intervals between scrape cycles.
+
+Plans change most often in the morning before school, and rarely at night or on weekends. The
+scheduler therefore scrapes every DSB_MIN_INTERVAL seconds during the peak windows and for a while
+after a change, every DSB_INTERVAL seconds otherwise, and backs off exponentially up to
+DSB_MAX_INTERVAL seconds, by a factor of DSB_SCHEDULE_BACKOFF per cycle, while nothing changes or
+cycles fail. Intervals get random jitter, and a backed-off interval never sleeps past the start
+of the next peak window.
+
+DSB_PEAK_WINDOWS lists windows in local time, separated by commas, each optionally preceded by a
+day or range of days, e.g. "Mon-Fri 06:00-08:30,Sun 18:00-21:00".
+"""
+import random
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from os import getenv
+
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# DEFAULT VALUES
+INTERVAL = float(getenv("DSB_INTERVAL", "300"))
+MIN_INTERVAL = float(getenv("DSB_MIN_INTERVAL", "60"))
+MAX_INTERVAL = float(getenv("DSB_MAX_INTERVAL", "3600"))
+SCHEDULE_BACKOFF = float(getenv("DSB_SCHEDULE_BACKOFF", "2"))
+JITTER = float(getenv("DSB_JITTER", "0.1"))
+PEAK_WINDOWS = getenv("DSB_PEAK_WINDOWS", "Mon-Fri 06:00-08:30,Mon-Fri 13:00-15:00")
+# Seconds after a change during which to scrape as often as in a peak window
+RECENT_CHANGE = float(getenv("DSB_RECENT_CHANGE", "1800"))
+
+# Cap of the backoff exponent, far beyond any maximum interval
+MAX_STEPS = 32
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+@dataclass(frozen=True)
+class PeakWindow:
+    """A daily time window on some weekdays (0 is Monday)."""
+    days: frozenset[int]
+    start: time
+    end: time
+
+    def __contains__(self, moment: datetime) -> bool:
+        return moment.weekday() in self.days and self.start <= moment.time() < self.end
+
+    def next_start(self, moment: datetime) -> datetime:
+        """Return the first start of the window after the given moment."""
+        for offset in range(8):
+            day = moment.date() + timedelta(days=offset)
+            start = datetime.combine(day, self.start, moment.tzinfo)
+            if day.weekday() in self.days and start > moment:
+                return start
+        raise ValueError("Peak window without days")
+
+
+def parse_days(spec: str) -> frozenset[int]:
+    """Parse a day ("Sat") or range of days ("Mon-Fri") into weekday numbers."""
+    first, _, last = spec.lower().partition("-")
+    try:
+        start = WEEKDAYS.index(first[:3])
+        end = WEEKDAYS.index(last[:3]) if last else start
+    except ValueError as e:
+        raise ValueError(f"Invalid days '{spec}', expected e.g. 'Mon-Fri' or 'Sat'") from e
+    return frozenset((start + i) % 7 for i in range((end - start) % 7 + 1))
+
+
+def parse_windows(spec: str) -> list[PeakWindow]:
+    """
+    Parse peak windows like "Mon-Fri 06:00-08:30,Sun 18:00-21:00".
+
+    Args:
+        spec (str): Comma-separated windows. Without days, a window applies to every day.
+
+    Returns:
+        list[PeakWindow]: The windows, empty for an empty spec.
+
+    Raises:
+        ValueError: If a window is malformed or ends before it starts.
+    """
+    windows = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        days_spec, _, hours = item.rpartition(" ")
+        days = parse_days(days_spec.strip()) if days_spec.strip() else frozenset(range(7))
+        try:
+            start, end = (time.fromisoformat(value) for value in hours.split("-"))
+        except ValueError as e:
+            raise ValueError(f"Invalid peak window '{item}', expected e.g. "
+                             "'Mon-Fri 06:00-08:30'") from e
+        if end <= start:
+            raise ValueError(f"Peak window '{item}' must end after it starts")
+        windows.append(PeakWindow(days, start, end))
+    return windows
+
+
+class AdaptiveSchedule:
+    """Compute the delay before the next scrape cycle from the outcome of the previous ones."""
+
+    def __init__(self, *, interval: float = INTERVAL, min_interval: float = MIN_INTERVAL,
+                 max_interval: float = MAX_INTERVAL, factor: float = SCHEDULE_BACKOFF,
+                 jitter: float = JITTER, peak_windows: list[PeakWindow] | None = None,
+                 recent_change: float = RECENT_CHANGE, rng: random.Random | None = None):
+        """
+        Args:
+            interval (float): Seconds between cycles outside peak windows.
+            min_interval (float): Seconds between cycles in peak windows and after changes.
+            max_interval (float): Upper bound of backed-off intervals.
+            factor (float): Growth of the interval per unchanged or failed cycle.
+            jitter (float): Random variation of each delay, as a fraction of it.
+            peak_windows (list[PeakWindow] | None): Defaults to DSB_PEAK_WINDOWS.
+            recent_change (float): Seconds after a change that count as a peak.
+            rng (random.Random | None): Source of the jitter.
+        """
+        self.interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.max_interval = max(max_interval, interval)
+        self.factor = factor
+        self.jitter = jitter
+        self.peak_windows = parse_windows(PEAK_WINDOWS) if peak_windows is None \
+            else peak_windows
+        self.recent_change = recent_change
+        self.rng = rng or random.Random()
+        self.unchanged = 0
+        self.errors = 0
+        self.last_change: datetime | None = None
+        self.peak = False
+
+    def in_peak(self, now: datetime) -> bool:
+        """Return whether the moment is in a peak window or shortly after a change."""
+        if self.last_change and (now - self.last_change).total_seconds() < self.recent_change:
+            return True
+        return any(now in window for window in self.peak_windows)
+
+    def next_peak(self, now: datetime) -> datetime | None:
+        """Return the next start of a peak window, if there are any."""
+        return min((window.next_start(now) for window in self.peak_windows), default=None)
+
+    def next_delay(self, changed: bool | None, now: datetime | None = None) -> float:
+        """
+        Record the outcome of a cycle and return the seconds to wait before the next one.
+
+        Args:
+            changed (bool | None): Whether the cycle changed the data, None if it failed.
+            now (datetime | None): The current local time. Defaults to datetime.now().
+
+        Returns:
+            float: The delay in seconds, including jitter.
+        """
+        now = now or datetime.now()
+        if changed is None:
+            self.errors = min(self.errors + 1, MAX_STEPS)
+        else:
+            self.errors = 0
+            self.unchanged = 0 if changed else min(self.unchanged + 1, MAX_STEPS)
+            if changed:
+                self.last_change = now
+
+        peak = self.in_peak(now)
+        if peak and not self.peak:
+            # A quiet night does not slow down the morning
+            self.unchanged = 0
+        self.peak = peak
+
+        base = self.min_interval if peak else self.interval
+        if self.errors:
+            # Back off from failing upstream servers even during peaks
+            delay = min(base * self.factor ** self.errors, self.max_interval)
+        else:
+            limit = self.interval if peak else self.max_interval
+            delay = min(base * self.factor ** self.unchanged, limit)
+
+        if not peak and not self.errors:
+            next_peak = self.next_peak(now)
+            if next_peak is not None:
+                delay = min(delay, max((next_peak - now).total_seconds(), self.min_interval))
+
+        delay *= 1 + self.rng.uniform(-self.jitter, self.jitter)
+        logger.debug("Next cycle in %.0f s (peak: %s, unchanged: %s, errors: %s)",
+                     delay, peak, self.unchanged, self.errors)
+        return delay
@@ -13,19 +13,53 @@ __Status__ = "Development"
 import json
 import os
 import socket
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
 
-from flask import Flask, Response, abort, jsonify, request
+from flask import Flask, Response, abort, g, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS  # pylint: disable=E0401 # type: ignore
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required
 from werkzeug.security import check_password_hash, generate_password_hash
 from waitress import serve
 
+import history
+import http_compression
+import json_io
+import metrics
+import runner
+from index import FILTERS
 from logger import setup_logger
+from store import DataStore, Snapshot
 
 # Initialize logger
 logger = setup_logger(__name__)
 
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider serializing with json_io, i.e. with orjson when it is installed.
+
+    Unlike the default provider, orjson serializes datetime objects as ISO 8601 strings
+    instead of HTTP dates. The API only returns strings and numbers, so its output is the same.
+    """
+
+    def dumps_bytes(self, obj: Any, **kwargs: Any) -> bytes:
+        """Serialize to UTF-8 encoded JSON with sorted keys, like the default provider."""
+        return json_io.dumps(obj, pretty=kwargs.get("indent") is not None,
+                             sort_keys=self.sort_keys, default=self.default)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return self.dumps_bytes(obj, **kwargs).decode("utf-8")
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return json_io.loads(s)
+
+
 app = Flask(__name__)
+app.json = JSONProvider(app)
 
 # TODO: Update CORS origins
 CORS(app, resources={r"/*": {"origins": "https://home.pertermann.de"}})
@@ -54,22 +88,102 @@ swagger_ui_blueprint = get_swaggerui_blueprint(
 )
 app.register_blueprint(swagger_ui_blueprint, url_prefix=SWAGGER_URL)
 
-def load_json_file():
+# Formatted document served by the API, kept in memory and reloaded when the file changes.
+# The scheduler points the store at the runner's actual output, see scheduler.run_flask_app().
+DATA_FILE = runner.OUTPUT_FILE
+store = DataStore(DATA_FILE, dumps=lambda obj: app.json.dumps_bytes(obj) + b"\n")
+
+
+# Seconds clients may reuse a response before revalidating it with its ETag
+CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', '0'))
+
+# Change notifications: default and maximum long-poll wait, keep-alive interval of event streams
+POLL_TIMEOUT = 30.0
+MAX_POLL_TIMEOUT = 60.0
+STREAM_KEEPALIVE = 15.0
+
+# Waitress worker threads, and how many of them long-polls and event streams may hold at once.
+# Every waiting client occupies a thread, so the rest are kept free for the other endpoints.
+THREADS = int(os.environ.get('API_THREADS', '16'))
+MAX_WAITERS = max(0, min(int(os.environ.get('API_MAX_WAITERS', '8')), THREADS - 1))
+waiters = threading.BoundedSemaphore(MAX_WAITERS)
+
+
+def acquire_waiter() -> None:
+    """Reserve a slot for a waiting client, or abort with 503 if all are taken."""
+    if not waiters.acquire(blocking=False):  # pylint: disable=R1732
+        abort(503, description="Too many clients waiting for changes, try again later")
+
+
+def json_response(key: tuple | None, select: Callable[[Snapshot], Any]) -> Response:
     """
-    Load JSON data from file.
+    Build a JSON response from the data store, serialized once per dataset version.
+
+    The response carries a strong ETag derived from the dataset version, so clients that send
+    it back in If-None-Match get an empty 304 response until the data changes. Bodies are
+    compressed according to Accept-Encoding; compressed bodies are cached per version as well.
+
+    Args:
+        key (tuple | None): Identifies the endpoint and its arguments. None serializes and
+            compresses the body on every request instead, for endpoints whose arguments are
+            unbounded, so clients cannot fill the cache by varying them.
+        select (Callable[[Snapshot], Any]): Picks the part of the dataset version to return.
 
     Returns:
-        dict: Loaded JSON data or empty dict with 'substitution' key if error occurs.
+        Response: The JSON response, or 304 Not Modified.
     """
-    try:
-        with open('json/änderung.json', 'r', encoding='utf-8') as schema_file:
-        # with open('json/formatted.json', 'r', encoding='utf-8') as schema_file:
-            return json.load(schema_file)
-    except FileNotFoundError:
-        logger.info("Error: The file 'json/formatted.json' was not found.")
-    except json.JSONDecodeError:
-        logger.info("Error: Failed to decode JSON from the file.")
-    return {"substitution": []}
+    if key is None:
+        snapshot = store.snapshot()
+        body, version = store.dumps(select(snapshot)), snapshot.version
+    else:
+        body, version = store.serialized(key, select)
+    encoding = None
+    if len(body) >= http_compression.MIN_SIZE:
+        encoding = request.accept_encodings.best_match(http_compression.ENCODINGS)
+    if encoding and key is None:
+        body = http_compression.compress(body, encoding)
+    elif encoding:
+        body, version = store.serialized(key, select, encoding)
+
+    response = Response(body, mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.content_encoding = encoding
+        response.set_etag(f"{version}-{encoding}")
+    else:
+        response.set_etag(version)
+    response.cache_control.private = True
+    response.cache_control.max_age = CACHE_MAX_AGE
+    response.cache_control.must_revalidate = True
+    return response.make_conditional(request)
+
+
+def version_info(snapshot: Snapshot) -> dict:
+    """Describe a dataset version for change notifications."""
+    return {"version": snapshot.version, "createdAt": snapshot.data.get("createdAt")}
+
+
+def sse_event(snapshot: Snapshot) -> str:
+    """Format a dataset version as a Server-Sent Event."""
+    return (f"id: {snapshot.version}\nevent: version\n"
+            f"data: {json.dumps(version_info(snapshot))}\n\n")
+
+
+@app.before_request
+def start_timer() -> None:
+    """Remember when the request started, see record_latency()."""
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_latency(response: Response) -> Response:
+    """Record the latency of a request by route, method and status."""
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.observe("api_request_duration_seconds", time.perf_counter() - start,
+                        route=route, method=request.method, status=str(response.status_code))
+    return response
 
 
 @app.route('/', methods=['GET'])
@@ -89,7 +203,14 @@ def hello_world() -> Response:
     3. /api/                 - Retrieve all substitution plans.
     4. /api/&lt;task_id&gt;/       - Retrieve a specific substitution entry by index.
     5. /api/&lt;task_id&gt;/&lt;content_id&gt;/ - Retrieve a specific content item from a substitution entry.
-    6. /api/healthcheck      - Check the health status of the API server.
+    6. /api/changes?since=&lt;version&gt; - Wait for a new dataset version (long-poll).
+    7. /api/stream           - Receive new dataset versions as Server-Sent Events.
+    8. /api/diff?from=&lt;version&gt;&amp;to=&lt;version&gt; - Retrieve the changes between two versions.
+    9. /api/search           - Filter the current entries by date, weekday, teacher, room or subject.
+    10. /api/history         - Query every substitution entry seen so far.
+    11. /api/history/courses - List the courses in the history.
+    12. /api/healthcheck     - Check the health status of the API server.
+    13. /metrics             - Scrape cycle and API metrics in the Prometheus text format.
     </pre>
     <h2>Endpoint Descriptions</h2>
     <pre>
@@ -109,8 +230,43 @@ def hello_world() -> Response:
                               Example: GET /api/1/2/
                               Required: JWT token in Authorization header
 
+    /api/changes           : Waits until the dataset version differs from 'since', then returns
+                              the new version. Returns changed=false after 'timeout' seconds.
+                              Example: GET /api/changes?since=3f2a9c1d0b7e4a65&timeout=30
+                              Required: JWT token in Authorization header
+
+    /api/stream            : Server-Sent Events stream with one 'version' event per new dataset.
+                              Example: GET /api/stream
+                              Required: JWT token in Authorization header
+
+    /api/diff              : Returns the added, removed and modified entries per day between two
+                              recent dataset versions. 'to' defaults to the current version;
+                              'from=empty' returns every entry as added.
+                              Example: GET /api/diff?from=3f2a9c1d0b7e4a65
+                              Required: JWT token in Authorization header
+
+    /api/search            : Returns the current entries matching all given filters, each with the
+                              date and weekDay of its day. Filters: date, weekday (number or
+                              name), teacher, room, subject. Values are case-insensitive.
+                              Example: GET /api/search?teacher=(xy)&weekday=Montag
+                              Required: JWT token in Authorization header
+
+    /api/history           : Returns recorded entries with first_seen/last_seen, newest day first.
+                              Filters: course, teacher, room, from, to (dates), limit, offset.
+                              Example: GET /api/history?course=MSS12&from=2024-09-01&teacher=(xy)
+                              Required: JWT token in Authorization header
+
+    /api/history/courses   : Returns every recorded course with its entry count and date range.
+                              Example: GET /api/history/courses
+                              Required: JWT token in Authorization header
+
     /api/healthcheck      : Simple endpoint to check the health of the server.
                               Example: GET /api/healthcheck
+
+    /metrics               : Per-stage durations of the scrape cycles (auth, postings, index,
+                              day_page, parse, format, validate, write), bytes fetched, rows
+                              parsed, cache lookups, changes and API latencies by route.
+                              Example: GET /metrics
     </pre>
     <h2>Contact</h2>
     <p>Author: <a href="https://pertermann.de">PrtmPhlp</a></p>
@@ -155,8 +311,7 @@ def get_plans() -> Response:
     Returns:
         Response: A JSON response containing all plans.
     """
-    plans = load_json_file()
-    return jsonify(plans)
+    return json_response(("plans",), lambda snapshot: snapshot.data)
 
 
 @app.route('/api/<int:task_id>/', methods=['GET'])
@@ -171,10 +326,9 @@ def get_plan(task_id: int) -> Response:
     Returns:
         Response: A JSON response containing the substitution entry, or a 404 error if not found.
     """
-    plans = load_json_file()
     try:
-        substitution = plans['substitution'][task_id]
-        return jsonify(substitution)
+        return json_response(("plan", task_id),
+                             lambda snapshot: snapshot.data['substitution'][task_id])
     except IndexError:
         abort(404, description="Substitution entry not found")
 
@@ -192,15 +346,161 @@ def get_content(task_id: int, content_id: int) -> Response:
     Returns:
         Response: A JSON response containing the content item, or a 404 error if not found.
     """
-    plans = load_json_file()
     try:
-        substitution = plans['substitution'][task_id]
-        content = substitution['content'][content_id]
-        return jsonify(content)
+        return json_response(
+            ("content", task_id, content_id),
+            lambda snapshot: snapshot.data['substitution'][task_id]['content'][content_id])
     except IndexError:
         abort(404, description="Content item not found")
 
 
+@app.route('/api/changes', methods=['GET'])
+@jwt_required()
+def get_changes() -> Response:
+    """
+    Long-poll for a new dataset version.
+
+    Query Args:
+        since (str): The version the client already has. Without it, returns immediately.
+        timeout (float): Seconds to wait for a new version, at most MAX_POLL_TIMEOUT.
+
+    Returns:
+        Response: JSON with the current version and whether it differs from 'since', or a 503
+            error if API_MAX_WAITERS clients are already waiting.
+    """
+    since = request.args.get('since')
+    timeout = min(request.args.get('timeout', POLL_TIMEOUT, type=float), MAX_POLL_TIMEOUT)
+    acquire_waiter()
+    try:
+        snapshot = store.wait_for_change(since, max(timeout, 0))
+    finally:
+        waiters.release()
+    return jsonify(changed=snapshot.version != since, **version_info(snapshot))
+
+
+@app.route('/api/stream', methods=['GET'])
+@jwt_required()
+def stream_changes() -> Response:
+    """
+    Stream new dataset versions as Server-Sent Events.
+
+    An event is sent on connect (unless Last-Event-ID is already the current version) and
+    whenever a new version is published. Comments keep idle connections open.
+
+    Returns:
+        Response: A text/event-stream response, or a 503 error if API_MAX_WAITERS clients are
+            already waiting.
+    """
+    def events():
+        version = request.headers.get('Last-Event-ID')
+        while True:
+            snapshot = store.wait_for_change(version, STREAM_KEEPALIVE)
+            if snapshot.version == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = snapshot.version
+            yield sse_event(snapshot)
+
+    acquire_waiter()
+    response = Response(stream_with_context(events()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Called by the server once the client is gone, even if the stream never started
+    response.call_on_close(waiters.release)
+    return response
+
+
+@app.route('/api/diff', methods=['GET'])
+@jwt_required()
+def get_diff() -> Response:
+    """
+    Retrieve the changes between two recent dataset versions.
+
+    Query Args:
+        from (str): The earlier version, e.g. the ETag of a previous /api/ response, or
+            'empty' to get every current entry as added.
+        to (str): The later version. Defaults to the current version.
+
+    Returns:
+        Response: The diff as JSON, or a 400/404 error if a version is missing or unknown.
+    """
+    from_version = request.args.get('from')
+    if not from_version:
+        abort(400, description="Missing 'from' version")
+
+    try:
+        diff = store.diff(from_version, request.args.get('to'))
+    except KeyError:
+        abort(404, description="Unknown version")
+
+    # A diff between two fixed versions never changes
+    response = jsonify(diff)
+    response.set_etag(f"{diff['from']}-{diff['to']}")
+    return response.make_conditional(request)
+
+
+@app.route('/api/search', methods=['GET'])
+@jwt_required()
+def search() -> Response:
+    """
+    Filter the entries of the current dataset version.
+
+    Query Args:
+        date, weekday, teacher, room, subject (str): Filters, see index.FILTERS. Entries must
+            match all of them.
+
+    Returns:
+        Response: A JSON list of the matching entries.
+    """
+    filters = {field: request.args[field] for field in FILTERS if field in request.args}
+    # Not cached: the filter values come from clients, and the index lookup is cheap
+    return json_response(None, lambda snapshot: snapshot.index.query(filters))
+
+
+@app.route('/api/history', methods=['GET'])
+@jwt_required()
+def get_history() -> Response:
+    """
+    Query the history of substitution entries.
+
+    Query Args:
+        course, teacher, room (str): Exact filters.
+        from, to (str): First and last day, as 2024-09-02 or 02-09-2024.
+        limit (int): Maximum number of entries, at most history.MAX_LIMIT.
+        offset (int): Number of entries to skip.
+
+    Returns:
+        Response: A JSON list of entries, or a 503 error if the history is disabled.
+    """
+    history_store = history.get_history()
+    if history_store is None:
+        abort(503, description="History is not available")
+
+    return jsonify(history_store.query(
+        course=request.args.get('course'),
+        teacher=request.args.get('teacher'),
+        room=request.args.get('room'),
+        date_from=request.args.get('from'),
+        date_to=request.args.get('to'),
+        limit=request.args.get('limit', history.DEFAULT_LIMIT, type=int),
+        offset=request.args.get('offset', 0, type=int),
+    ))
+
+
+@app.route('/api/history/courses', methods=['GET'])
+@jwt_required()
+def get_history_courses() -> Response:
+    """
+    List the courses in the history.
+
+    Returns:
+        Response: A JSON list of courses with entry counts and first and last day.
+    """
+    history_store = history.get_history()
+    if history_store is None:
+        abort(503, description="History is not available")
+    return jsonify(history_store.courses())
+
+
 @app.route("/api/healthcheck", methods=["GET"])
 def healthcheck():
     """
@@ -212,11 +512,30 @@ def healthcheck():
     return {"status": "success", "message": "Flask API for DSBMobile data"}
 
 
+@app.route("/metrics", methods=["GET"])
+def get_metrics() -> Response:
+    """
+    Expose the metrics of the API and of the scraper in the Prometheus text format.
+
+    In process mode the scraper runs in another process, so its metrics are read from the file
+    it dumps after every cycle (metrics.METRICS_FILE).
+
+    Returns:
+        Response: The metrics as text/plain.
+    """
+    snapshots = [metrics.REGISTRY.to_dict()]
+    dumped = metrics.load(metrics.METRICS_FILE) if metrics.METRICS_FILE else None
+    if dumped is not None and dumped.get("pid") != os.getpid():
+        snapshots.append(dumped)
+    return Response(metrics.render(snapshots), content_type=metrics.CONTENT_TYPE)
+
+
 if __name__ == '__main__':
     DEVELOPMENT = True
+    store.watch()
     if DEVELOPMENT:
         app.run(host='0.0.0.0', port=5555, debug=True)
     else:
         local_ip = socket.gethostbyname(socket.gethostname())
         print(f"Server running on http://{local_ip}:5555")
-        serve(app, host='0.0.0.0', port=5555, _quiet=False)
+        serve(app, host='0.0.0.0', port=5555, threads=THREADS, _quiet=False)
@@ -0,0 +1,303 @@
+"""
+Single-process asyncio mode: the API and the scrape loop share one event loop.
+
+The HTTP server runs on aiohttp. Requests are passed to the Flask app through a small WSGI bridge
+that runs the views on a thread pool, so all routes, authentication and caching behave exactly
+as under waitress. The long-lived change notification endpoints (/api/changes, /api/stream) are
+served natively on the event loop, so waiting clients do not occupy a thread.
+
+The scrape cycle runs as a background task and publishes each new formatted document straight
+into the API's data store instead of handing it over through files.
+"""
+import asyncio
+import io
+import sys
+import time
+from collections.abc import Callable
+from functools import partial
+from os import getenv
+from typing import Any
+
+from aiohttp import web
+from flask_jwt_extended import verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
+from multidict import CIMultiDict
+
+import app
+import metrics
+import runner
+from adaptive_schedule import AdaptiveSchedule
+from logger import setup_logger
+from store import Snapshot
+
+logger = setup_logger(__name__)
+
+# DEFAULT VALUES
+HOST = "0.0.0.0"
+PORT = 5555
+
+# Headers that are computed by aiohttp for the final response
+HOP_BY_HOP_HEADERS = {"content-length", "transfer-encoding", "connection"}
+
+
+def call_wsgi(wsgi_app: Callable, environ: dict[str, Any]) -> tuple[str, list, bytes]:
+    """
+    Call a WSGI application and collect its complete response.
+
+    Args:
+        wsgi_app (Callable): The WSGI application.
+        environ (dict): The WSGI environment of the request.
+
+    Returns:
+        tuple[str, list, bytes]: The status line, the response headers and the body.
+    """
+    response: dict[str, Any] = {}
+    chunks: list[bytes] = []
+
+    def start_response(status, headers, exc_info=None):  # pylint: disable=unused-argument
+        response["status"] = status
+        response["headers"] = headers
+        return chunks.append
+
+    result = wsgi_app(environ, start_response)
+    try:
+        chunks.extend(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return response["status"], response["headers"], b"".join(chunks)
+
+
+def build_environ(request: web.Request, body: bytes) -> dict[str, Any]:
+    """Translate an aiohttp request into a WSGI environment."""
+    host, _, port = (request.host or HOST).partition(":")
+    environ = {
+        "REQUEST_METHOD": request.method,
+        "SCRIPT_NAME": "",
+        # WSGI expects the decoded path as latin-1 code points of the original bytes
+        "PATH_INFO": request.path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": request.query_string,
+        "SERVER_NAME": host,
+        "SERVER_PORT": port or str(PORT),
+        "SERVER_PROTOCOL": f"HTTP/{request.version.major}.{request.version.minor}",
+        "REMOTE_ADDR": request.remote or "",
+        "CONTENT_TYPE": request.headers.get("Content-Type", ""),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": request.scheme,
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name in request.headers.keys():
+        key = "HTTP_" + name.upper().replace("-", "_")
+        if key not in ("HTTP_CONTENT_TYPE", "HTTP_CONTENT_LENGTH"):
+            environ[key] = ",".join(request.headers.getall(name))
+    return environ
+
+
+async def flask_handler(request: web.Request) -> web.Response:
+    """Serve a request with the Flask app on the default thread pool."""
+    body = await request.read()
+    environ = build_environ(request, body)
+
+    loop = asyncio.get_running_loop()
+    status, headers, content = await loop.run_in_executor(
+        None, call_wsgi, app.app.wsgi_app, environ)
+
+    code, _, reason = status.partition(" ")
+    response_headers = CIMultiDict(
+        (name, value) for name, value in headers if name.lower() not in HOP_BY_HOP_HEADERS)
+    return web.Response(status=int(code), reason=reason or None,
+                        headers=response_headers, body=content)
+
+
+class VersionNotifier:
+    """Wakes up coroutines waiting for a new dataset version."""
+
+    def __init__(self) -> None:
+        self._event = asyncio.Event()
+
+    def notify(self) -> None:
+        """Wake up all current waiters. Must be called on the event loop."""
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def wait_for_change(self, since: str | None, timeout: float) -> Snapshot:
+        """Async counterpart of DataStore.wait_for_change()."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        snapshot = app.store.snapshot()
+        while snapshot.version == since:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+            snapshot = app.store.snapshot()
+        return snapshot
+
+
+notifier = VersionNotifier()
+
+
+def authorized(request: web.Request) -> bool:
+    """
+    Check the request's credentials exactly like @jwt_required() does.
+
+    The check runs in a Flask request context, so it rejects refresh tokens and runs the app's
+    token callbacks (e.g. a blocklist) just like the Flask endpoints.
+    """
+    with app.app.request_context(build_environ(request, b"")):
+        try:
+            verify_jwt_in_request()
+        except (PyJWTError, JWTExtendedException):
+            return False
+    return True
+
+
+async def changes_handler(request: web.Request) -> web.Response:
+    """Long-poll for a new dataset version, see app.get_changes()."""
+    if not authorized(request):
+        return web.json_response({"msg": "Missing or invalid Authorization Header"}, status=401)
+
+    since = request.query.get("since")
+    try:
+        timeout = float(request.query.get("timeout", app.POLL_TIMEOUT))
+    except ValueError:
+        timeout = app.POLL_TIMEOUT
+    timeout = max(0.0, min(timeout, app.MAX_POLL_TIMEOUT))
+
+    snapshot = await notifier.wait_for_change(since, timeout)
+    return web.json_response({"changed": snapshot.version != since, **app.version_info(snapshot)},
+                             dumps=app.app.json.dumps)
+
+
+async def stream_handler(request: web.Request) -> web.StreamResponse:
+    """Stream new dataset versions as Server-Sent Events, see app.stream_changes()."""
+    if not authorized(request):
+        return web.json_response({"msg": "Missing or invalid Authorization Header"}, status=401)
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    await response.prepare(request)
+
+    version = request.headers.get("Last-Event-ID")
+    try:
+        while True:
+            snapshot = await notifier.wait_for_change(version, app.STREAM_KEEPALIVE)
+            if snapshot.version == version:
+                await response.write(b": keep-alive\n\n")
+                continue
+            version = snapshot.version
+            await response.write(app.sse_event(snapshot).encode("utf-8"))
+    except ConnectionResetError:
+        pass
+    return response
+
+
+@web.middleware
+async def record_latency(request: web.Request, handler: Callable) -> web.StreamResponse:
+    """Record the latency of the native routes; the Flask app records its own requests."""
+    if handler is flask_handler:
+        return await handler(request)
+
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        resource = request.match_info.route.resource
+        metrics.observe("api_request_duration_seconds", time.perf_counter() - start,
+                        route=resource.canonical if resource else "unmatched",
+                        method=request.method, status=str(status))
+
+
+def create_app() -> web.Application:
+    """Create the aiohttp application serving the API."""
+    web_app = web.Application(middlewares=[record_latency])
+    web_app.router.add_get("/api/changes", changes_handler)
+    web_app.router.add_get("/api/stream", stream_handler)
+    web_app.router.add_route("*", "/{path:.*}", flask_handler)
+    return web_app
+
+
+async def scrape_loop(schedule: AdaptiveSchedule) -> None:
+    """
+    Run scrape cycles at the intervals of the schedule and publish new data to the API's store.
+
+    Cycles run on a worker thread, since scraping uses blocking I/O. The first cycle always
+    publishes, so the API has data even if nothing changed since the last run, but does not
+    count as a change for the schedule.
+    """
+    loop = asyncio.get_running_loop()
+
+    def publish(document: dict) -> None:
+        app.store.publish(document)
+        loop.call_soon_threadsafe(notifier.notify)
+
+    force = True
+    while True:
+        logger.info("Executing the script...")
+        changed: bool | None = None
+        try:
+            result = await loop.run_in_executor(
+                None, partial(runner.main, publish=publish, force=force))
+            # The bootstrap cycle compares with data saved before the restart, which says
+            # nothing about how often the plans change right now
+            changed = False if force else result
+            force = False
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error("ERROR: %s", e)
+        delay = schedule.next_delay(changed)
+        logger.info("Next run in %.0f seconds", delay)
+        await asyncio.sleep(delay)
+
+
+def check_single_course() -> None:
+    """
+    Reject multi-course scraping, whose documents the API's single data store cannot serve.
+
+    Raises:
+        ValueError: If --courses or DSB_COURSES is set.
+    """
+    if runner.parse_args().courses or getenv("DSB_COURSES"):
+        raise ValueError("--courses and DSB_COURSES are not supported in async mode, since the "
+                         "API serves a single course. Use DSB_SERVER_MODE=process instead.")
+
+
+async def serve(host: str = HOST, port: int = PORT,
+                schedule: AdaptiveSchedule | None = None) -> None:
+    """
+    Serve the API and run the scrape loop until cancelled.
+
+    Raises:
+        ValueError: If multi-course scraping is configured, see check_single_course().
+    """
+    check_single_course()
+    web_runner = web.AppRunner(create_app())
+    await web_runner.setup()
+    await web.TCPSite(web_runner, host, port).start()
+    logger.info("ASYNC: Server running on http://%s:%s", host, port)
+
+    try:
+        await scrape_loop(schedule or AdaptiveSchedule())
+    finally:
+        await web_runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
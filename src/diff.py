@@ -0,0 +1,101 @@
+"""Structured differences between two formatted substitution documents."""
+from collections import Counter
+from typing import Any
+
+Entry = dict[str, Any]
+
+
+def index_entries(entries: list[Entry]) -> dict[tuple, Entry]:
+    """
+    Key the substitution entries of a day by position and subject.
+
+    Entries sharing position and subject are told apart by their order of appearance.
+
+    Args:
+        entries (list[Entry]): The content entries of a day.
+
+    Returns:
+        dict[tuple, Entry]: The entries keyed by (position, subject, occurrence).
+    """
+    seen: Counter = Counter()
+    indexed = {}
+    for entry in entries:
+        key = (entry.get("position"), entry.get("subject"))
+        indexed[(*key, seen[key])] = entry
+        seen[key] += 1
+    return indexed
+
+
+def diff_entries(old: list[Entry], new: list[Entry]) -> dict[str, list]:
+    """
+    Compare the substitution entries of a day.
+
+    Returns:
+        dict[str, list]: The "added" and "removed" entries and the "modified" ones as
+            {"before": ..., "after": ...} pairs.
+    """
+    old_entries = index_entries(old)
+    new_entries = index_entries(new)
+    return {
+        "added": [entry for key, entry in new_entries.items() if key not in old_entries],
+        "removed": [entry for key, entry in old_entries.items() if key not in new_entries],
+        "modified": [
+            {"before": old_entries[key], "after": entry}
+            for key, entry in new_entries.items()
+            if key in old_entries and old_entries[key] != entry
+        ],
+    }
+
+
+def diff_documents(old: dict[str, Any], new: dict[str, Any]) -> dict[str, Any]:
+    """
+    Compare two formatted documents day by day.
+
+    Days are matched by date. createdAt and the generated day ids are ignored, so only actual
+    substitution changes show up.
+
+    Args:
+        old (dict): The earlier formatted document.
+        new (dict): The later formatted document.
+
+    Returns:
+        dict: {"days": [...]} with one item per changed day, holding its date, weekDay, a status
+            of "added", "removed" or "modified" and the entry changes from diff_entries().
+    """
+    old_days = {day["date"]: day for day in old.get("substitution", [])}
+    new_days = {day["date"]: day for day in new.get("substitution", [])}
+
+    days = []
+    for date in dict.fromkeys([*new_days, *old_days]):
+        old_day, new_day = old_days.get(date), new_days.get(date)
+        changes = diff_entries(old_day["content"] if old_day else [],
+                               new_day["content"] if new_day else [])
+
+        if old_day is None:
+            status = "added"
+        elif new_day is None:
+            status = "removed"
+        elif any(changes.values()):
+            status = "modified"
+        else:
+            continue
+
+        days.append({
+            "date": date,
+            "weekDay": (new_day or old_day)["weekDay"],  # type: ignore
+            "status": status,
+            **changes,
+        })
+    return {"days": days}
+
+
+def summarize(diff: dict[str, Any]) -> str:
+    """Describe a diff in one line, e.g. for logs and notifications."""
+    if not diff["days"]:
+        return "no substitution changes"
+    counts = Counter()
+    for day in diff["days"]:
+        for change in ("added", "removed", "modified"):
+            counts[change] += len(day[change])
+    return (f"{len(diff['days'])} day(s) changed: {counts['added']} added, "
+            f"{counts['removed']} removed, {counts['modified']} modified")
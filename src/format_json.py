@@ -14,7 +14,9 @@ import json
 from datetime import datetime
 from typing import Any, Dict, List
 
+import json_io
 from logger import setup_logger
+from models import SubstitutionDay
 
 # Initialize logger
 logger = setup_logger(__name__)
@@ -31,48 +33,35 @@ WEEKDAY_MAP: Dict[str, int] = {
 }
 
 
-def create_substitution_entry(day: str, date: str, entries: List[List[str]]) -> Dict[str, Any]:
+def create_substitution_entry(day: str, date: str, entries: List[List[str]],
+                              entry_id: str | None = None) -> Dict[str, Any]:
     """
     Creates a substitution entry for a specific day.
 
     Args:
         day (str): The name of the weekday (e.g., 'Donnerstag').
         entries (List[List[str]]): List of entries where each entry is a list of strings.
+        entry_id (str | None): The id of the entry. Defaults to a count of the calls without one.
 
     Returns:
         Dict[str, Any]: A dictionary representing the substitution entry.
     """
-    if not hasattr(create_substitution_entry, "call_count"):
-        create_substitution_entry.call_count = 0
+    if entry_id is None:
+        if not hasattr(create_substitution_entry, "call_count"):
+            create_substitution_entry.call_count = 0
 
-    # Increment the counter each time the function is called
-    create_substitution_entry.call_count += 1
+        # Increment the counter each time the function is called without an id
+        create_substitution_entry.call_count += 1
+        entry_id = str(create_substitution_entry.call_count)
 
     iso_weekday_number = WEEKDAY_MAP.get(day, 0)
 
-    substitution_entry = {
-        "id": str(create_substitution_entry.call_count),
-        "date": date,
-        "weekDay": [str(iso_weekday_number), day],
-        "content": []
-    }
-    last_position = None
-
-    for entry in entries:
-        position = entry[1] if entry[1] else last_position
-        content_entry = {
-            "position": position,
-            "teacher": entry[2],
-            "subject": entry[3],
-            "room": entry[4],
-            "topic": entry[5],
-            "info": entry[6]
-        }
-        if position:
-            last_position = position
-        substitution_entry["content"].append(content_entry)
-
-    return substitution_entry
+    return SubstitutionDay.from_rows(
+        entry_id,
+        date,
+        (str(iso_weekday_number), day),
+        entries,
+    ).to_dict()
 
 
 def fill_json_template(json_data: Dict[str, List[List[str]]], course: str) -> Dict[str, Any]:
@@ -96,41 +85,46 @@ def fill_json_template(json_data: Dict[str, List[List[str]]], course: str) -> Di
         # Splitting the string using '_'
         day, date = day.split('_')
         try:
-            substitution_entry = create_substitution_entry(day, date, entries)
+            # Number the days per document, so unchanged days stay equal between runs
+            entry_id = str(len(output_json["substitution"]) + 1)
+            substitution_entry = create_substitution_entry(day, date, entries, entry_id)
             output_json["substitution"].append(substitution_entry)
         except Exception as e:  # pylint: disable=W0718
             logger.error("Error processing day '%s': %s", day, e)
     return output_json
 
 
-def main(course: str, input_file: str, output_file: str) -> None:
+def main(course: str, input_file: str, output_file: str) -> Dict[str, Any] | None:
     """
     Main function to process the JSON data and save the output.
 
     Args:
         input_file (str): Path to the input JSON file.
         output_file (str): Path to the output JSON file.
+
+    Returns:
+        Dict[str, Any] | None: The formatted data, or None if it could not be created or saved.
     """
     try:
         with open(input_file, 'r', encoding='utf-8') as file:
             json_data: Dict[str, List[List[str]]] = json.load(file)
     except FileNotFoundError:
         logger.error("The file '%s' was not found.", input_file)
-        return
+        return None
     except json.JSONDecodeError:
         logger.error("Error decoding JSON from the file '%s'.", input_file)
-        return
+        return None
 
     filled_json = fill_json_template(json_data, course)
 
     try:
-        with open(output_file, 'w', encoding='utf-8') as file:
-            json.dump(filled_json, file, indent=4, ensure_ascii=False)
+        json_io.write_json(output_file, filled_json)
     except Exception as e:  # pylint: disable=W0718
         logger.error("Error saving data to '%s': %s", output_file, e)
-        return
+        return None
 
     logger.info("JSON template filled and saved to '%s'", output_file)
+    return filled_json
 
 
 # Example usage
@@ -0,0 +1,260 @@
+"""
+Append-only history of every substitution entry ever seen, stored in SQLite.
+
+Each distinct entry of a course and day is stored once, with the time it first and last appeared
+on the plan. Entries are never deleted or overwritten, so the history survives the JSON files
+being replaced on every scrape cycle.
+"""
+import sqlite3
+import threading
+from datetime import datetime
+from os import getenv
+from typing import Any
+
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# DEFAULT VALUES
+# An empty path disables the history
+DB_PATH = getenv("DSB_HISTORY_DB", "json/history.sqlite3")
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+FIELDS = ("position", "teacher", "subject", "room", "topic", "info")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    course TEXT NOT NULL,
+    date TEXT NOT NULL,
+    day TEXT NOT NULL,
+    week_day TEXT NOT NULL,
+    position TEXT NOT NULL,
+    teacher TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    room TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    info TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    UNIQUE (course, day, position, teacher, subject, room, topic, info)
+);
+CREATE INDEX IF NOT EXISTS entries_course_day ON entries (course, day);
+CREATE INDEX IF NOT EXISTS entries_day ON entries (day);
+CREATE INDEX IF NOT EXISTS entries_teacher ON entries (teacher, day);
+CREATE INDEX IF NOT EXISTS entries_room ON entries (room, day);
+"""
+
+UPSERT = """
+INSERT INTO entries (course, date, day, week_day, position, teacher, subject, room, topic, info,
+                     first_seen, last_seen)
+VALUES (:course, :date, :day, :week_day, :position, :teacher, :subject, :room, :topic, :info,
+        :seen, :seen)
+ON CONFLICT (course, day, position, teacher, subject, room, topic, info)
+DO UPDATE SET last_seen = excluded.last_seen
+"""
+
+# Entries recorded together last got the same last_seen, so it identifies the current ones
+TOUCH = "UPDATE entries SET last_seen = ? WHERE course = ? AND last_seen = ? AND day IN ({days})"
+
+
+def iso_day(date: str) -> str:
+    """
+    Convert a plan date such as '02-09-2024' to '2024-09-02', so days sort and compare correctly.
+
+    Dates in other formats are returned unchanged.
+    """
+    for date_format in ("%d-%m-%Y", "%d.%m.%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(date, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return date
+
+
+class HistoryStore:
+    """
+    SQLite store of substitution entries with first-seen and last-seen timestamps.
+
+    One connection is shared between threads and serialized with a lock; SQLite's WAL mode lets
+    the API read while the scraper process writes.
+    """
+
+    def __init__(self, path: str = DB_PATH):
+        """
+        Args:
+            path (str): Path of the SQLite database. Created if it does not exist.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        # Time each course's current entries were last recorded, see touch()
+        self._last_seen: dict[str, str] = {}
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+
+    def record(self, course: str, document: dict[str, Any], seen_at: str | None = None) -> int:
+        """
+        Record the entries of a formatted document.
+
+        New entries are inserted; entries already known only get their last_seen updated.
+
+        Args:
+            course (str): The course the document belongs to.
+            document (dict): The formatted document.
+            seen_at (str | None): ISO timestamp of the observation. Defaults to now.
+
+        Returns:
+            int: The number of entries recorded.
+        """
+        seen = seen_at or datetime.now().isoformat(timespec="seconds")
+        rows = [
+            {
+                "course": course,
+                "date": day["date"],
+                "day": iso_day(day["date"]),
+                "week_day": day["weekDay"][1],
+                "seen": seen,
+                **{field: entry.get(field) or "" for field in FIELDS},
+            }
+            for day in document.get("substitution", [])
+            for entry in day["content"]
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany(UPSERT, rows)
+            self._last_seen[course] = seen
+        return len(rows)
+
+    def touch(self, course: str, document: dict[str, Any], seen_at: str | None = None) -> int:
+        """
+        Record that an unchanged document is still on the plan.
+
+        Only updates last_seen of the entries recorded last for the document's days, with a
+        single statement. The first call for a course in a process records the whole document.
+
+        Args:
+            course (str): The course the document belongs to.
+            document (dict): The formatted document, unchanged since it was last recorded.
+            seen_at (str | None): ISO timestamp of the observation. Defaults to now.
+
+        Returns:
+            int: The number of entries updated or recorded.
+        """
+        previous = self._last_seen.get(course)
+        if previous is None:
+            return self.record(course, document, seen_at)
+        seen = seen_at or datetime.now().isoformat(timespec="seconds")
+        days = [iso_day(day["date"]) for day in document.get("substitution", [])]
+        sql = TOUCH.format(days=", ".join("?" * len(days)))
+        with self._lock, self._connection:
+            count = self._connection.execute(sql, (seen, course, previous, *days)).rowcount
+            self._last_seen[course] = seen
+        return count
+
+    def query(self, course: str | None = None, teacher: str | None = None,
+              room: str | None = None, date_from: str | None = None,
+              date_to: str | None = None, limit: int = DEFAULT_LIMIT,
+              offset: int = 0) -> list[dict[str, Any]]:
+        """
+        Query recorded entries, newest day first.
+
+        Args:
+            course (str | None): Only entries of this course.
+            teacher (str | None): Only entries of this teacher.
+            room (str | None): Only entries in this room.
+            date_from (str | None): Only days on or after this date.
+            date_to (str | None): Only days on or before this date.
+            limit (int): Maximum number of entries, at most MAX_LIMIT.
+            offset (int): Number of entries to skip.
+
+        Returns:
+            list[dict[str, Any]]: The matching entries.
+        """
+        conditions, params = [], []
+        for column, value in (("course", course), ("teacher", teacher), ("room", room)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if date_from is not None:
+            conditions.append("day >= ?")
+            params.append(iso_day(date_from))
+        if date_to is not None:
+            conditions.append("day <= ?")
+            params.append(iso_day(date_to))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = (f"SELECT course, date, week_day, {', '.join(FIELDS)}, first_seen, last_seen "
+               f"FROM entries {where} ORDER BY day DESC, course, position, id LIMIT ? OFFSET ?")
+        params += [max(0, min(limit, MAX_LIMIT)), max(0, offset)]
+
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return [
+            {**{key: row[key] for key in ("course", "date", *FIELDS, "first_seen", "last_seen")},
+             "weekDay": row["week_day"]}
+            for row in rows
+        ]
+
+    def courses(self) -> list[dict[str, Any]]:
+        """Return every recorded course with its number of entries and covered days."""
+        sql = ("SELECT course, COUNT(*) AS entries, MIN(day) AS first_day, MAX(day) AS last_day "
+               "FROM entries GROUP BY course ORDER BY course")
+        with self._lock:
+            rows = self._connection.execute(sql).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+_store: HistoryStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_history() -> HistoryStore | None:
+    """
+    Return the shared history store, opening it on first use.
+
+    Returns:
+        HistoryStore | None: The store, or None if the history is disabled or cannot be opened.
+    """
+    global _store  # pylint: disable=global-statement
+    if not DB_PATH:
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = HistoryStore(DB_PATH)
+            except sqlite3.Error as e:
+                logger.error("Could not open history database '%s': %s", DB_PATH, e)
+                return None
+        return _store
+
+
+def record(course: str, document: dict[str, Any] | None) -> None:
+    """Record a formatted document in the shared history store, logging instead of raising."""
+    store = get_history()
+    if store is None or document is None:
+        return
+    try:
+        count = store.record(course, document)
+        logger.debug("Recorded %s history entries for %s", count, course)
+    except (sqlite3.Error, KeyError, IndexError) as e:
+        logger.error("Could not record history for %s: %s", course, e)
+
+
+def touch(course: str, document: dict[str, Any] | None) -> None:
+    """Record that an unchanged document is still current, logging instead of raising."""
+    store = get_history()
+    if store is None or document is None:
+        return
+    try:
+        count = store.touch(course, document)
+        logger.debug("Updated %s history entries for %s", count, course)
+    except (sqlite3.Error, KeyError, IndexError) as e:
+        logger.error("Could not update history for %s: %s", course, e)
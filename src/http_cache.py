@@ -0,0 +1,209 @@
+"""HTTP validator cache for conditional GET requests of DSB plan pages."""
+import hashlib
+import threading
+from collections.abc import Callable, Hashable, Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+import requests
+
+import metrics
+
+T = TypeVar("T")
+
+# Size of the body chunks passed to streaming parsers
+CHUNK_SIZE = 8192
+
+
+@dataclass
+class CacheEntry:
+    """Validators, body and parse results remembered for a single URL."""
+    etag: str | None
+    last_modified: str | None
+    digest: str
+    content: bytes
+    parsed: dict[Hashable, Any] = field(default_factory=dict)
+    # False if the download was abandoned early, so only the parse results can be reused
+    complete: bool = True
+
+    def headers(self) -> dict[str, str]:
+        """Return the headers of a conditional request for the URL."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclass
+class FetchResult:
+    """The body of a URL and whether it differs from the previous fetch."""
+    content: bytes
+    digest: str
+    changed: bool
+
+
+class ValidatorCache:
+    """
+    Remember ETag, Last-Modified and a content hash per URL.
+
+    Repeated fetches send If-None-Match / If-Modified-Since. A 304 response or a body with an
+    unchanged hash is served from the cache, together with anything parsed from it before, so
+    unchanged pages are neither downloaded twice (if the server supports validators) nor parsed
+    twice.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, CacheEntry] = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, session: requests.Session, url: str, timeout: float = 10) -> FetchResult:
+        """
+        Send a conditional GET request for the given URL.
+
+        Args:
+            session (requests.Session): The session to send the request with.
+            url (str): The URL to fetch.
+            timeout (float): Request timeout in seconds.
+
+        Returns:
+            FetchResult: The (possibly cached) body and whether it changed.
+
+        Raises:
+            requests.exceptions.RequestException: If the request fails or returns an HTTP error.
+        """
+        entry = self._entries.get(url)
+        if entry is not None and not entry.complete:
+            entry = None
+        headers = entry.headers() if entry is not None else {}
+
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and entry is not None:
+            metrics.inc("dsb_cache_lookups_total", cache="http", result="not_modified")
+            return FetchResult(entry.content, entry.digest, changed=False)
+        response.raise_for_status()
+
+        content = response.content
+        metrics.inc("dsb_fetched_bytes_total", len(content))
+        digest = hashlib.sha256(content).hexdigest()
+        if entry is not None and entry.digest == digest:
+            metrics.inc("dsb_cache_lookups_total", cache="http", result="unchanged")
+            return FetchResult(entry.content, digest, changed=False)
+        metrics.inc("dsb_cache_lookups_total", cache="http", result="miss")
+
+        with self._lock:
+            self._entries[url] = CacheEntry(
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                digest=digest,
+                content=content,
+            )
+        return FetchResult(content, digest, changed=True)
+
+    def fetch_parsed(self, session: requests.Session, url: str, parse: Callable[[bytes], T],
+                     key: Hashable = None, timeout: float = 10) -> T:
+        """
+        Fetch a URL and parse its body, reusing the previous result if the body is unchanged.
+
+        Args:
+            session (requests.Session): The session to send the request with.
+            url (str): The URL to fetch.
+            parse (Callable[[bytes], T]): Turns the response body into the result.
+            key (Hashable): Distinguishes different parse functions applied to the same URL.
+            timeout (float): Request timeout in seconds.
+
+        Returns:
+            T: The parse result. Cached results are shared, so callers must not modify them.
+        """
+        result = self.fetch(session, url, timeout)
+        entry = self._entries.get(url)
+        if entry is None or entry.digest != result.digest:
+            metrics.inc("dsb_cache_lookups_total", cache="parse", result="miss")
+            return parse(result.content)
+
+        if key not in entry.parsed:
+            metrics.inc("dsb_cache_lookups_total", cache="parse", result="miss")
+            entry.parsed[key] = parse(result.content)
+        else:
+            metrics.inc("dsb_cache_lookups_total", cache="parse", result="hit")
+        return entry.parsed[key]
+
+    def fetch_streamed(self, session: requests.Session, url: str,
+                       parse: Callable[[Iterable[bytes]], T], key: Hashable = None,
+                       timeout: float = 10) -> T:
+        """
+        Fetch a URL and parse its body while it downloads, reusing the previous result on a 304.
+
+        The request is conditional like in fetch(), but only a 200 response is streamed. parse
+        may stop reading before the end of the body; then only the validators and the result
+        are remembered, since the body cannot be hashed.
+
+        Args:
+            session (requests.Session): The session to send the request with.
+            url (str): The URL to fetch.
+            parse (Callable[[Iterable[bytes]], T]): Turns the chunks of the body into the result.
+            key (Hashable): Distinguishes different parse functions applied to the same URL.
+            timeout (float): Request timeout in seconds.
+
+        Returns:
+            T: The parse result. Cached results are shared, so callers must not modify them.
+
+        Raises:
+            requests.exceptions.RequestException: If the request fails or returns an HTTP error.
+        """
+        entry = self._entries.get(url)
+        if entry is not None and key not in entry.parsed and not entry.complete:
+            entry = None
+        headers = entry.headers() if entry is not None else {}
+
+        with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+            if response.status_code == 304 and entry is not None:
+                metrics.inc("dsb_cache_lookups_total", cache="http", result="not_modified")
+                if key not in entry.parsed:
+                    metrics.inc("dsb_cache_lookups_total", cache="parse", result="miss")
+                    entry.parsed[key] = parse([entry.content])
+                else:
+                    metrics.inc("dsb_cache_lookups_total", cache="parse", result="hit")
+                return entry.parsed[key]
+            response.raise_for_status()
+            metrics.inc("dsb_cache_lookups_total", cache="http", result="miss")
+            metrics.inc("dsb_cache_lookups_total", cache="parse", result="miss")
+
+            chunks: list[bytes] = []
+            complete = False
+
+            def read() -> Iterator[bytes]:
+                nonlocal complete
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    metrics.inc("dsb_fetched_bytes_total", len(chunk))
+                    chunks.append(chunk)
+                    yield chunk
+                complete = True
+
+            result = parse(read())
+
+        content = b"".join(chunks) if complete else b""
+        with self._lock:
+            self._entries[url] = CacheEntry(
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                digest=hashlib.sha256(content).hexdigest() if complete else "",
+                content=content,
+                parsed={key: result},
+                complete=complete,
+            )
+        return result
+
+    def digest(self, url: str) -> str | None:
+        """Return the content hash of the last body fetched from the given URL."""
+        entry = self._entries.get(url)
+        return entry.digest if entry is not None and entry.complete else None
+
+    def invalidate(self, url: str | None = None) -> None:
+        """Forget a single URL, or every URL if none is given."""
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(url, None)
@@ -0,0 +1,36 @@
+"""Response compression helpers shared by the API servers."""
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MIN_SIZE = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 9
+
+# Supported encodings, preferred first
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """
+    Compress a response body.
+
+    Args:
+        body (bytes): The uncompressed body.
+        encoding (str): "br" or "gzip".
+
+    Returns:
+        bytes: The compressed body. Output is deterministic, so it can be cached per version.
+
+    Raises:
+        ValueError: If the encoding is not supported.
+    """
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
@@ -0,0 +1,73 @@
+"""Shared HTTP session with keep-alive connection pools and a retry policy."""
+import threading
+from os import getenv
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# DEFAULT VALUES
+POOL_SIZE = int(getenv("DSB_POOL_SIZE", "10"))
+RETRIES = int(getenv("DSB_RETRIES", "3"))
+BACKOFF_FACTOR = float(getenv("DSB_BACKOFF_FACTOR", "0.5"))
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Seconds to wait for a connection or for data from the server
+TIMEOUT = float(getenv("DSB_TIMEOUT", "10"))
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def create_session(pool_size: int = POOL_SIZE, retries: int = RETRIES,
+                   backoff_factor: float = BACKOFF_FACTOR) -> requests.Session:
+    """
+    Create a session that keeps connections alive and retries failed GET requests.
+
+    Args:
+        pool_size (int): Number of keep-alive connections kept per host.
+        retries (int): Number of retries for connection errors and retryable status codes.
+        backoff_factor (float): Exponential backoff factor between retries, in seconds.
+
+    Returns:
+        requests.Session: The configured session.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,  # Hand the last response to raise_for_status()
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide session, creating it on first use.
+
+    The session lives as long as the process, so connections to the DSB hosts are reused across
+    scheduler cycles.
+    """
+    global _session  # pylint: disable=global-statement
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def set_session(session: requests.Session | None) -> None:
+    """
+    Replace the process-wide session, e.g. with a differently configured or instrumented one.
+
+    Passing None closes the current session; a new one is created on the next get_session().
+    """
+    global _session  # pylint: disable=global-statement
+    with _session_lock:
+        if _session is not None and _session is not session:
+            _session.close()
+        _session = session
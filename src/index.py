@@ -0,0 +1,94 @@
+"""Secondary indexes over the substitution entries of a formatted document."""
+from collections.abc import Iterable
+from typing import Any
+
+from history import iso_day
+from logger import setup_logger
+from models import SubstitutionDay, SubstitutionEntry
+
+logger = setup_logger(__name__)
+
+# Query parameters that can be filtered on
+FILTERS = ("date", "weekday", "teacher", "room", "subject")
+
+
+def normalize(field: str, value: str) -> str:
+    """Normalize a value for lookups: case-insensitive, dates in ISO format."""
+    value = str(value).strip()
+    if field == "date":
+        return iso_day(value)
+    return value.casefold()
+
+
+class SubstitutionIndex:
+    """
+    Posting lists from filter values to the entries of a document, built once per version.
+
+    Entries are kept as compact SubstitutionEntry records next to their SubstitutionDay, so an
+    index over many versions costs little memory. A query intersects the posting lists of its
+    filters by walking the shortest one, so it costs O(matches of the most selective filter)
+    instead of a scan of the whole document.
+    """
+
+    def __init__(self, document: dict[str, Any]):
+        """
+        Args:
+            document (dict): The formatted document.
+        """
+        self.entries: list[tuple[SubstitutionDay, SubstitutionEntry]] = []
+        self._keys: list[dict[str, set[str]]] = []
+        self._postings: dict[str, dict[str, list[int]]] = {field: {} for field in FILTERS}
+
+        for data in document.get("substitution", []):
+            try:
+                day = SubstitutionDay.from_dict(data)
+            except (KeyError, IndexError, TypeError) as e:
+                logger.warning("Skipping malformed day in index: %s", e)
+                continue
+            day_keys = {
+                "date": {normalize("date", day.date)},
+                # Weekdays can be looked up by number or by name
+                "weekday": {normalize("weekday", value) for value in day.week_day},
+            }
+            for entry in day.content:
+                keys = {
+                    **day_keys,
+                    "teacher": {normalize("teacher", entry.teacher or "")},
+                    "room": {normalize("room", entry.room or "")},
+                    "subject": {normalize("subject", entry.subject or "")},
+                }
+                position = len(self.entries)
+                self.entries.append((day, entry))
+                self._keys.append(keys)
+                for field, values in keys.items():
+                    for value in values:
+                        self._postings[field].setdefault(value, []).append(position)
+
+    def query(self, filters: dict[str, str]) -> list[dict[str, Any]]:
+        """
+        Return the entries matching all filters, in document order.
+
+        Args:
+            filters (dict[str, str]): Filter values keyed by names from FILTERS.
+
+        Returns:
+            list[dict[str, Any]]: The matching entries, each with the date and weekDay of its
+                day. All entries without filters.
+        """
+        wanted = {field: normalize(field, value) for field, value in filters.items()}
+        if not wanted:
+            positions: Iterable[int] = range(len(self.entries))
+        else:
+            postings = {field: self._postings[field].get(value, [])
+                        for field, value in wanted.items()}
+            shortest = min(postings, key=lambda field: len(postings[field]))
+            positions = (
+                position for position in postings[shortest]
+                if all(value in self._keys[position][field] for field, value in wanted.items())
+            )
+
+        results = []
+        for position in positions:
+            day, entry = self.entries[position]
+            results.append({"date": day.date, "weekDay": list(day.week_day), **entry.to_dict()})
+        return results
@@ -0,0 +1,142 @@
+"""
+JSON serialization and atomic file writes shared by the scraper and the API.
+
+Uses orjson when it is installed and the standard library otherwise; set DSB_JSON_BACKEND to
+"json" to force the standard library. Output is compact UTF-8 unless DSB_JSON_PRETTY is set.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from collections.abc import Callable
+from os import getenv
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# DEFAULT VALUES
+BACKEND = "orjson" if orjson is not None and getenv("DSB_JSON_BACKEND", "auto") != "json" \
+    else "json"
+PRETTY = getenv("DSB_JSON_PRETTY", "").lower() in ("1", "true", "yes")
+
+# Permissions of written files
+FILE_MODE = 0o644
+
+
+def dumps(data: Any, pretty: bool = False, sort_keys: bool = False,
+          default: Callable[[Any], Any] | None = None) -> bytes:
+    """
+    Serialize data to UTF-8 encoded JSON.
+
+    Args:
+        data (Any): The data to serialize.
+        pretty (bool): Indent the output by two spaces instead of writing it compactly.
+        sort_keys (bool): Sort the keys of objects.
+        default (Callable | None): Converts objects the backend cannot serialize.
+
+    Returns:
+        bytes: The encoded JSON.
+    """
+    if BACKEND == "orjson":
+        option = (orjson.OPT_INDENT_2 if pretty else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(data, default=default, option=option)
+
+    return json.dumps(
+        data, indent=2 if pretty else None, separators=None if pretty else (",", ":"),
+        sort_keys=sort_keys, default=default, ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def loads(content: bytes | str) -> Any:
+    """Decode JSON from bytes or a string."""
+    if BACKEND == "orjson":
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def digest(content: bytes) -> str:
+    """Return a hash of serialized content, used to detect changes without decoding."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def file_digest(path: str) -> str | None:
+    """Return the digest of a file's content, or None if it cannot be read."""
+    try:
+        with open(path, 'rb') as file:
+            return digest(file.read())
+    except OSError:
+        return None
+
+
+def load_json(path: str, default: Any = None) -> Any:
+    """
+    Load a JSON file.
+
+    Args:
+        path (str): Path of the file.
+        default (Any): Returned if the file is missing or not valid JSON.
+
+    Returns:
+        Any: The decoded content, or `default`.
+    """
+    try:
+        with open(path, 'rb') as file:
+            return loads(file.read())
+    except (OSError, ValueError):
+        return default
+
+
+def write_bytes(path: str, content: bytes) -> None:
+    """
+    Write a file atomically.
+
+    The content is written to a temporary file in the same directory, which then replaces the
+    target with a rename. Readers such as the API see either the old or the new file, never a
+    partially written one.
+
+    Args:
+        path (str): Path of the file.
+        content (bytes): The content to write.
+
+    Raises:
+        OSError: If the file cannot be written. The target is left unchanged.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            # mkstemp creates the file private to the owner
+            os.fchmod(file.fileno(), FILE_MODE)
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json(path: str, data: Any, pretty: bool | None = None) -> str:
+    """
+    Write a JSON file atomically, see write_bytes().
+
+    Args:
+        path (str): Path of the file.
+        data (Any): The data to write.
+        pretty (bool | None): Indent the output. Defaults to DSB_JSON_PRETTY.
+
+    Returns:
+        str: The digest of the written content.
+
+    Raises:
+        OSError: If the file cannot be written. The target is left unchanged.
+    """
+    content = dumps(data, pretty=PRETTY if pretty is None else pretty)
+    write_bytes(path, content)
+    return digest(content)
@@ -0,0 +1,276 @@
+"""
+Per-stage timers and counters of the scrape cycle and the API.
+
+Metrics are kept in memory per process and rendered in the Prometheus text format by the
+/metrics endpoint. The runner also dumps them as JSON after every cycle to DSB_METRICS_FILE
+(empty to disable), which is how the API exposes the metrics of a scraper running in another
+process.
+"""
+import math
+import os
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from os import getenv
+from typing import Any
+
+import json_io
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# DEFAULT VALUES
+METRICS_FILE = getenv("DSB_METRICS_FILE", "json/metrics.json")
+
+# Upper bounds of the histogram buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Known metrics: name -> (type, help)
+METRICS = {
+    "dsb_stage_duration_seconds": (
+        "histogram", "Duration of the stages of a scrape cycle"),
+    "dsb_last_cycle_stage_seconds": (
+        "gauge", "Total time spent in each stage during the last scrape cycle"),
+    "dsb_last_cycle_timestamp_seconds": (
+        "gauge", "Unix time at which the last scrape cycle finished"),
+    "dsb_cycles_total": (
+        "counter", "Scrape cycles by result"),
+    "dsb_fetched_bytes_total": (
+        "counter", "Bytes of response bodies received from DSB"),
+    "dsb_parsed_rows_total": (
+        "counter", "Table rows parsed from day pages"),
+    "dsb_cache_lookups_total": (
+        "counter", "Lookups of the HTTP, parse and discovery caches by result"),
+    "dsb_changes_total": (
+        "counter", "Changed formatted documents written, by course"),
+    "api_request_duration_seconds": (
+        "histogram", "Latency of API requests by route, method and status"),
+}
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    """Observation counts per bucket, with their total count and sum."""
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self) -> None:
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add one observation."""
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> list[int]:
+        """Return the number of observations up to each bucket bound, as Prometheus expects."""
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class Registry:
+    """Thread-safe store of counters, gauges and histograms, keyed by name and labels."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: dict[str, dict[Labels, float]] = {}
+        self._histograms: dict[str, dict[Labels, Histogram]] = {}
+        # Seconds per stage since the current cycle started
+        self._cycle: dict[str, float] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Increase a counter."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._values.setdefault(name, {})
+            values[key] = values.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """Set a gauge."""
+        with self._lock:
+            self._values.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Add an observation to a histogram."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histograms = self._histograms.setdefault(name, {})
+            if key not in histograms:
+                histograms[key] = Histogram()
+            histograms[key].observe(value)
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        """Record the duration of a stage, both in its histogram and in the cycle total."""
+        self.observe("dsb_stage_duration_seconds", seconds, stage=stage)
+        with self._lock:
+            self._cycle[stage] = self._cycle.get(stage, 0) + seconds
+
+    def start_cycle(self) -> None:
+        """Reset the stage totals of the cycle."""
+        with self._lock:
+            self._cycle.clear()
+
+    def finish_cycle(self) -> None:
+        """Publish the stage totals of the cycle as gauges."""
+        with self._lock:
+            self._values["dsb_last_cycle_stage_seconds"] = {
+                (("stage", stage),): seconds for stage, seconds in self._cycle.items()}
+            self._values["dsb_last_cycle_timestamp_seconds"] = {(): time.time()}
+
+    def reset(self) -> None:
+        """Forget all metrics."""
+        with self._lock:
+            self._values.clear()
+            self._histograms.clear()
+            self._cycle.clear()
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Return all metrics in a JSON-serializable form, as read by render().
+
+        Returns:
+            dict: The process id, the current time and the samples of every metric.
+        """
+        result: dict[str, Any] = {}
+        with self._lock:
+            for name, values in self._values.items():
+                result[name] = [{"labels": dict(key), "value": value}
+                                for key, value in values.items()]
+            for name, histograms in self._histograms.items():
+                result[name] = [{"labels": dict(key), "buckets": histogram.cumulative(),
+                                 "count": histogram.count, "sum": histogram.sum}
+                                for key, histogram in histograms.items()]
+        return {"pid": os.getpid(), "time": time.time(), "buckets": list(BUCKETS),
+                "metrics": result}
+
+
+REGISTRY = Registry()
+
+
+def inc(name: str, value: float = 1, **labels: str) -> None:
+    """Increase a counter of the default registry."""
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    """Add an observation to a histogram of the default registry."""
+    REGISTRY.observe(name, value, **labels)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Time the enclosed block as a stage of the scrape cycle, even if it raises.
+
+    Stages running in several threads at once, like day pages, add up to more than the
+    wall-clock time of the cycle.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe_stage(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def cycle(path: str | None = None) -> Iterator[None]:
+    """
+    Time the enclosed block as one scrape cycle and dump the metrics afterwards.
+
+    Args:
+        path (str | None): File to dump the metrics to as JSON. Defaults to METRICS_FILE;
+            an empty string disables the dump.
+    """
+    REGISTRY.start_cycle()
+    result = "error"
+    try:
+        with timed("cycle"):
+            yield
+        result = "ok"
+    finally:
+        REGISTRY.inc("dsb_cycles_total", result=result)
+        REGISTRY.finish_cycle()
+        path = METRICS_FILE if path is None else path
+        if path:
+            dump(path)
+
+
+def dump(path: str) -> None:
+    """Write the metrics of the default registry to a JSON file, logging errors."""
+    try:
+        json_io.write_json(path, REGISTRY.to_dict())
+    except OSError as e:
+        logger.warning("Could not write metrics to %s: %s", path, e)
+
+
+def load(path: str) -> dict[str, Any] | None:
+    """Load metrics dumped by another process, or None if there are none."""
+    dumped = json_io.load_json(path)
+    return dumped if isinstance(dumped, dict) and "metrics" in dumped else None
+
+
+def format_value(value: float) -> str:
+    """Format a sample value, writing whole numbers without a fraction."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    """Format labels as {name="value",...}."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def render(snapshots: Iterable[dict[str, Any]]) -> str:
+    """
+    Render metrics in the Prometheus text exposition format.
+
+    Args:
+        snapshots (Iterable[dict]): Metrics as returned by Registry.to_dict(), e.g. of this
+            process and of the scraper process. Samples of the same metric are merged.
+
+    Returns:
+        str: The exposition text.
+    """
+    samples: dict[str, list[tuple[list[float], dict]]] = {}
+    for snapshot in snapshots:
+        bounds = snapshot.get("buckets", BUCKETS)
+        for name, metric_samples in snapshot["metrics"].items():
+            samples.setdefault(name, []).extend((bounds, sample) for sample in metric_samples)
+
+    lines = []
+    for name, metric_samples in samples.items():
+        kind, text = METRICS.get(name, ("untyped", ""))
+        lines += [f"# HELP {name} {text}", f"# TYPE {name} {kind}"]
+        for bounds, sample in metric_samples:
+            labels = sample["labels"]
+            if kind != "histogram":
+                lines.append(f"{name}{format_labels(labels)} {format_value(sample['value'])}")
+                continue
+            for bound, count in zip([*bounds, math.inf], [*sample["buckets"], sample["count"]]):
+                bucket_labels = format_labels({**labels, "le": format_value(bound)})
+                lines.append(f"{name}_bucket{bucket_labels} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {format_value(sample['sum'])}")
+            lines.append(f"{name}_count{format_labels(labels)} {sample['count']}")
+    return "\n".join(lines) + "\n"
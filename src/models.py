@@ -0,0 +1,103 @@
+"""Compact records for formatted substitution plans, serialized to the layout of schema/schema.json."""
+import sys
+from dataclasses import dataclass
+from typing import Any
+
+
+def intern(value: Any) -> Any:
+    """
+    Intern a string, so repeated values such as teachers and rooms share one object.
+
+    Values that are not strings are returned unchanged.
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@dataclass(slots=True, frozen=True)
+class SubstitutionEntry:
+    """One row of a substitution plan."""
+    position: str
+    teacher: str
+    subject: str
+    room: str
+    topic: str
+    info: str
+
+    @classmethod
+    def from_row(cls, row: list[str], position: str | None) -> "SubstitutionEntry":
+        """
+        Create an entry from a scraped table row.
+
+        Args:
+            row (list[str]): The cells of the row: course, position, teacher, subject, room,
+                topic and info.
+            position (str | None): The position to use if the row has none, i.e. the position
+                of the row above.
+        """
+        return cls(intern(row[1] or position), intern(row[2]), intern(row[3]),
+                   intern(row[4]), intern(row[5]), intern(row[6]))
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "SubstitutionEntry":
+        """Create an entry from its formatted JSON object."""
+        return cls(intern(data["position"]), intern(data["teacher"]), intern(data["subject"]),
+                   intern(data["room"]), intern(data["topic"]), intern(data["info"]))
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize the entry to its formatted JSON object."""
+        return {
+            "position": self.position,
+            "teacher": self.teacher,
+            "subject": self.subject,
+            "room": self.room,
+            "topic": self.topic,
+            "info": self.info,
+        }
+
+
+@dataclass(slots=True, frozen=True)
+class SubstitutionDay:
+    """The substitution entries of one day."""
+    id: str
+    date: str
+    week_day: tuple[str, str]
+    content: tuple[SubstitutionEntry, ...]
+
+    @classmethod
+    def from_rows(cls, day_id: str, date: str, week_day: tuple[str, str],
+                  rows: list[list[str]]) -> "SubstitutionDay":
+        """
+        Create a day from its scraped table rows.
+
+        Rows without a position continue the position of the row above.
+
+        Args:
+            day_id (str): The id of the day within its document.
+            date (str): The date, e.g. '02-09-2024'.
+            week_day (tuple[str, str]): The ISO weekday number and the weekday name.
+            rows (list[list[str]]): The scraped rows of the day.
+        """
+        content = []
+        last_position = None
+        for row in rows:
+            entry = SubstitutionEntry.from_row(row, last_position)
+            if entry.position:
+                last_position = entry.position
+            content.append(entry)
+        return cls(day_id, date, (intern(week_day[0]), intern(week_day[1])), tuple(content))
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "SubstitutionDay":
+        """Create a day from its formatted JSON object."""
+        week_day = data["weekDay"]
+        return cls(data["id"], data["date"], (intern(week_day[0]), intern(week_day[1])),
+                   tuple(SubstitutionEntry.from_dict(entry) for entry in data["content"]))
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize the day to its formatted JSON object."""
+        return {
+            "id": self.id,
+            "date": self.date,
+            "weekDay": list(self.week_day),
+            "content": [entry.to_dict() for entry in self.content],
+        }
@@ -0,0 +1,173 @@
+"""
+Optional profiling of scrape cycles with cProfile.
+
+Pass --profile to the runner (or to the scheduler, which hands its arguments on) to profile every
+cycle, or set DSB_PROFILE_EVERY to profile the first and then every Nth cycle. Each profile is
+written to DSB_PROFILE_DIR as a dated .prof file, to be opened with `python -m pstats` or a viewer
+like snakeviz, and its top DSB_PROFILE_TOP functions are logged.
+"""
+import cProfile
+import io
+import os
+import pstats
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from os import getenv
+from typing import TypeVar
+
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# DEFAULT VALUES
+PROFILE_EVERY = int(getenv("DSB_PROFILE_EVERY", "0"))
+PROFILE_DIR = getenv("DSB_PROFILE_DIR", "profiles")
+PROFILE_TOP = int(getenv("DSB_PROFILE_TOP", "25"))
+
+# Order of the logged summary, see pstats.SortKey
+SORT_KEY = "cumulative"
+
+T = TypeVar("T")
+
+
+class ThreadProfilers:
+    """
+    Profile tasks of worker threads, such as the day page workers, while a cycle is profiled.
+
+    Before Python 3.12 a cProfile.Profile only sees the thread that enabled it. From 3.12 on it
+    sees every thread, and enabling a second one fails, so no extra profilers are needed.
+    """
+
+    def __init__(self) -> None:
+        self.active = False
+        self.profilers: list[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start collecting the profiles of worker tasks."""
+        with self._lock:
+            self.active = True
+            self.profilers = []
+
+    def stop(self) -> list[cProfile.Profile]:
+        """Stop collecting and return the profiles of the worker tasks since start()."""
+        with self._lock:
+            self.active = False
+            profilers, self.profilers = self.profilers, []
+        return profilers
+
+    def run(self, func: Callable[..., T], *args) -> T:
+        """Call func on the calling thread with a profiler enabled only during the call."""
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return func(*args)
+        try:
+            return func(*args)
+        finally:
+            profiler.disable()
+            with self._lock:
+                if self.active:
+                    self.profilers.append(profiler)
+
+    def wrap(self, func: Callable[..., T]) -> Callable[..., T]:
+        """Return func, profiled on its worker thread if a cycle is being profiled."""
+        if not self.active:
+            return func
+        return lambda *args: self.run(func, *args)
+
+
+THREADS = ThreadProfilers()
+
+
+def in_thread(func: Callable[..., T]) -> Callable[..., T]:
+    """Wrap a function that worker threads run so that a profiled cycle includes its calls."""
+    return THREADS.wrap(func)
+
+
+def summarize(stats: pstats.Stats, top: int) -> str:
+    """Return the `top` most expensive functions of a profile as text."""
+    stream = io.StringIO()
+    stats.stream = stream  # type: ignore[attr-defined]
+    stats.sort_stats(SORT_KEY).print_stats(top)
+    return stream.getvalue()
+
+
+@contextmanager
+def profile(label: str = "cycle", directory: str = PROFILE_DIR,
+            top: int = PROFILE_TOP) -> Iterator[None]:
+    """
+    Profile the enclosed block, save the profile and log a summary, even if the block raises.
+
+    Args:
+        label (str): Prefix of the profile's file name.
+        directory (str): Directory to save the profile to, created if missing.
+        top (int): Number of functions in the logged summary.
+    """
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Another profiler is already active, e.g. when running under `python -m cProfile`
+        logger.warning("Profiling not possible: %s", e)
+        yield
+        return
+
+    THREADS.start()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        stats = pstats.Stats(profiler)
+        for thread_profiler in THREADS.stop():
+            stats.add(thread_profiler)
+        save(stats, label, directory, top)
+
+
+def save(stats: pstats.Stats, label: str, directory: str, top: int) -> None:
+    """Write a profile to a dated file and log its summary, logging errors instead of raising."""
+    path = os.path.join(directory, f"{label}-{datetime.now():%Y%m%d-%H%M%S}.prof")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        stats.dump_stats(path)
+    except OSError as e:
+        logger.warning("Could not save profile to %s: %s", path, e)
+        path = "(not saved)"
+    logger.info("Profile of %s saved to %s\n%s", label, path, summarize(stats, top))
+
+
+class CycleProfiler:
+    """Count cycles and profile the first and then every Nth one."""
+
+    def __init__(self, every: int = PROFILE_EVERY, directory: str = PROFILE_DIR,
+                 top: int = PROFILE_TOP):
+        """
+        Args:
+            every (int): Profile every Nth cycle. 0 only profiles cycles that force it.
+            directory (str): Directory to save profiles to.
+            top (int): Number of functions in the logged summaries.
+        """
+        self.every = every
+        self.directory = directory
+        self.top = top
+        self.cycles = 0
+
+    def due(self, force: bool = False) -> bool:
+        """Count a cycle and return whether to profile it."""
+        self.cycles += 1
+        return force or (self.every > 0 and (self.cycles - 1) % self.every == 0)
+
+    @contextmanager
+    def cycle(self, force: bool = False) -> Iterator[None]:
+        """Run the enclosed cycle, profiling it if it is due."""
+        if not self.due(force):
+            yield
+            return
+        with profile(f"cycle{self.cycles}", self.directory, self.top):
+            yield
+
+
+PROFILER = CycleProfiler()
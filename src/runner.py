@@ -5,10 +5,17 @@ Example for runner as a module
 """
 
 import argparse
+from collections.abc import Callable
+from os import getenv
 
 from rich_argparse import RawDescriptionRichHelpFormatter
 
+import diff
 import format_json
+import history
+import json_io
+import metrics
+import profiler
 import schema
 import scraper
 from logger import setup_logger
@@ -16,6 +23,11 @@ from logger import setup_logger
 # DEFAULT VALUES
 RAW_FILE = "json/scraped.json"
 SCHEMA_FILE = "schema/schema.json"
+# Formatted output, which the API serves
+OUTPUT_FILE = "json/formatted.json"
+
+# Last validated document per output file, so unchanged days are not validated again
+VALIDATED: dict[str, dict] = {}
 
 
 def parse_args() -> argparse.Namespace:
@@ -45,21 +57,130 @@ def parse_args() -> argparse.Namespace:
                         help="Set verbosity level to DEBUG")
     parser.add_argument("-c", "--course", type=str, nargs="?", default="MSS12",
                         help="Select the course to scrape. Default: MSS12")
+    parser.add_argument("-C", "--courses", type=str, nargs="+", metavar="COURSE", default=None,
+                        help="Scrape several courses (or 'all') with one pass per day page, "
+                        "writing one output per course. Default: $DSB_COURSES")
+    parser.add_argument("-w", "--workers", type=int, default=scraper.DEFAULT_WORKERS,
+                        help="Number of day pages to fetch concurrently. "
+                        "Default: $DSB_WORKERS or 4")
+    parser.add_argument("-s", "--stream", action="store_true", default=scraper.STREAMING,
+                        help="Parse day pages while downloading and stop after the course block. "
+                        "Only faster for courses near the top of the table; unchanged pages are "
+                        "not downloaded either way. Default: $DSB_STREAMING")
     parser.add_argument('-p', "--print-output",
                         action='store_true', help='Print output to console')
     parser.add_argument(
-        "-o", "--output-dir", type=str, nargs="?", default="json/formatted.json",
-        help="Output directory for JSON files. Default: json/formatted.json"
+        "-o", "--output-dir", type=str, nargs="?", default=OUTPUT_FILE,
+        help=f"Output directory for JSON files. Default: {OUTPUT_FILE}"
     )
     parser.add_argument(
         "-d", "--development", action="store_true", default=False,
         help="Dont exit when no changes are detected"
     )
+    parser.add_argument(
+        "--profile", action="store_true", default=False,
+        help="Profile every cycle with cProfile and log the top functions. "
+        "Profiles are saved to $DSB_PROFILE_DIR or profiles/; "
+        "set $DSB_PROFILE_EVERY to only profile every Nth cycle"
+    )
     return parser.parse_args()
 
 
-def main() -> bool:
-    """Main function that orchestrates the scraping and processing of DSB data."""
+def served_file(args: argparse.Namespace) -> str:
+    """
+    Return the formatted output of args.course, i.e. the document the API serves.
+
+    With --courses or DSB_COURSES, that is the course's own variant of the output path.
+    """
+    if args.courses or getenv("DSB_COURSES"):
+        return scraper.course_file_path(args.output_dir, args.course)
+    return args.output_dir
+
+
+def current_document(path: str) -> dict | None:
+    """
+    Return the formatted document last written to path, reading the file only once per process.
+
+    Documents are validated before they are written, so the one read is remembered in VALIDATED.
+    """
+    if path not in VALIDATED:
+        document = json_io.load_json(path)
+        if not isinstance(document, dict) or not document:
+            return None
+        VALIDATED[path] = document
+    return VALIDATED[path]
+
+
+def process_course(course: str, raw_data: dict, raw_file: str,  # pylint: disable=R0913
+                   output_file: str, schema_file: str, *, changed: bool = True) -> dict:
+    """
+    Format and validate the scraped data of a course in memory, then persist it.
+
+    Nothing is written unless the formatted document is valid. Both files are replaced
+    atomically, so readers never see a half-written file.
+
+    Args:
+        course (str): The course the data belongs to.
+        raw_data (dict): The scraped rows keyed by day.
+        raw_file (str): Path of the raw output.
+        output_file (str): Path of the formatted output.
+        schema_file (str): Path of the JSON schema.
+        changed (bool): Whether the scraped data changed, False if it is only processed again
+            because of force or --development. Only changes are counted in the metrics.
+
+    Returns:
+        dict: The formatted document.
+
+    Raises:
+        jsonschema.exceptions.ValidationError: If the formatted document is invalid.
+    """
+    logger = setup_logger(__name__)
+
+    # Kept from the last cycle, only read from the file after a restart
+    previous = current_document(output_file)
+
+    # Format data
+    with metrics.timed("format"):
+        document = format_json.fill_json_template(raw_data, course)
+
+    # Validate data
+    with metrics.timed("validate"):
+        schema.validate(document, schema_file, previous)
+    VALIDATED[output_file] = document
+
+    # Save data, the raw file last since it marks the data as processed
+    with metrics.timed("write"):
+        json_io.write_json(output_file, document)
+        logger.info("JSON template filled and saved to '%s'", output_file)
+        scraper.save_data(raw_data, raw_file)
+    if changed:
+        metrics.inc("dsb_changes_total", course=course)
+
+    logger.info("%s: %s", course, diff.summarize(diff.diff_documents(previous or {}, document)))
+    history.record(course, document)
+    return document
+
+
+def main(publish: Callable[[dict], None] | None = None, force: bool = False) -> bool:
+    """
+    Main function that orchestrates the scraping and processing of DSB data.
+
+    Scraping, formatting and validation pass the data on in memory; files are only written
+    at the end, and only if the scraped data changed.
+
+    Args:
+        publish (Callable[[dict], None] | None): Called with the validated formatted document of
+            args.course, e.g. to hand it to an in-process API without going through files.
+        force (bool): Format and publish even if the scraped data did not change.
+
+    Returns:
+        bool: Whether the scraped data changed since it was last saved, e.g. to adapt the scrape
+            interval. Cycles that only format and publish because of force or --development
+            return False if the data is the same.
+
+    Raises:
+        scraper.ScrapeError: If every day page failed; nothing is saved then.
+    """
     logger = setup_logger(__name__)
 
     # Parse arguments
@@ -71,20 +192,71 @@ def main() -> bool:
     if args.verbose:
         logger.debug("Verbose mode enabled")
 
+    if args.courses is None and getenv("DSB_COURSES"):
+        args.courses = [getenv("DSB_COURSES")]
+
+    if force:
+        args.development = True
+
+    with metrics.cycle(), profiler.PROFILER.cycle(args.profile):
+        if args.courses:
+            return main_multi_course(args, publish)
+
+        # Scrape data
+        raw_data = scraper.scrape_data(args)
+
+        # Decided before process_course() saves the data and updates the saved hash
+        changed = scraper.data_changed(raw_data, args.raw_file)
+        if not changed and not args.development:
+            logger.info("No changes detected in scraped data. Exiting...")
+            # The plan is unchanged, but still current: update when its entries were last seen
+            history.touch(args.course, current_document(args.output_dir))
+            return False
+
+        document = process_course(
+            args.course, raw_data, args.raw_file, args.output_dir, args.schema_file, changed=changed)
+
+        if publish:
+            publish(document)
+
+        return changed
+
+
+def main_multi_course(args: argparse.Namespace,
+                      publish: Callable[[dict], None] | None = None) -> bool:
+    """
+    Scrape, format and validate one output per course from a single pass over the plans.
+
+    The document of args.course, if it is among the scraped courses, is passed to publish.
+
+    Returns:
+        bool: Whether the data of any course changed.
+    """
+    logger = setup_logger(__name__)
+
     # Scrape data
-    changes_detected = scraper.main(args)
+    course_dict = scraper.scrape_multi_course(args)
 
-    if not changes_detected and not args.development:
-        logger.info("No changes detected in scraped data. Exiting...")
-        return True
+    changed = False
+    for course, raw_data in course_dict.items():
+        raw_file = scraper.course_file_path(args.raw_file, course)
+        output_file = scraper.course_file_path(args.output_dir, course)
 
-    # Format data
-    format_json.main(args.course, args.raw_file, args.output_dir)
+        course_changed = scraper.data_changed(raw_data, raw_file)
+        if not course_changed and not args.development:
+            history.touch(course, current_document(output_file))
+            continue
 
-    # Validate data
-    schema.main(args.schema_file, args.output_dir)
+        changed = changed or course_changed
+        document = process_course(
+            course, raw_data, raw_file, output_file, args.schema_file, changed=course_changed)
+
+        if publish and course == args.course:
+            publish(document)
 
-    return True
+    if not changed:
+        logger.info("No changes detected in scraped data. Exiting...")
+    return changed
 
 
 if __name__ == "__main__":
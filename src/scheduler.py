@@ -1,4 +1,4 @@
-"""Scheduler module for running periodic tasks using the schedule library."""
+"""Scheduler module running scrape cycles at adaptive intervals, see adaptive_schedule."""
 
 import asyncio
 import multiprocessing
@@ -6,21 +6,33 @@ import signal
 import socket
 import sys
 import time
+from os import getenv
 
-import schedule
 from waitress import serve
 
 import app
+import async_server
 import runner
+from adaptive_schedule import AdaptiveSchedule
 
+# "process": waitress in a child process, data handed over through files (default)
+# "async": API and scrape loop in one asyncio event loop, data handed over in memory
+SERVER_MODE = getenv("DSB_SERVER_MODE", "process")
 
-def task():
-    """Execute the main runner script and log its execution."""
+
+def task() -> bool | None:
+    """
+    Execute the main runner script and log its execution.
+
+    Returns:
+        bool | None: Whether the data changed, or None if the cycle failed.
+    """
     print("Executing the script...")
     try:
-        runner.main()
-    except Exception as e:
+        return runner.main()
+    except Exception as e:  # pylint: disable=broad-exception-caught
         print(f"ERROR: {e}")
+        return None
 
 
 def signal_handler(*_):
@@ -34,7 +46,10 @@ def run_flask_app():
     hostname = socket.gethostname()
     local_ip = socket.gethostbyname(hostname)
     print(f"PRODUCTION: Server running on http://{local_ip}:5555")
-    serve(app.app, host='0.0.0.0', port=5555)
+    # Serve the file the scraper writes, also if --output-dir or --courses changed it
+    app.store.path = runner.served_file(runner.parse_args())
+    app.store.watch()
+    serve(app.app, host='0.0.0.0', port=5555, threads=app.THREADS)
 
 
 def main():
@@ -43,22 +58,22 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
+    if SERVER_MODE == "async":
+        # API and scraper share one process and event loop, see async_server
+        asyncio.run(async_server.serve())
+        return
+
     # Start Flask app in a separate process
     flask_process = multiprocessing.Process(target=run_flask_app)
     flask_process.start()
 
-    # Execute immediately upon startup
-    task()
-
-    # Schedule the task to run every 30 seconds
-    # schedule.every(30).seconds.do(task)
-    schedule.every(5).minutes.do(task)
-
-    # Run the scheduled tasks indefinitely
+    # Execute immediately upon startup, then after a delay adapted to the outcome
+    schedule = AdaptiveSchedule()
     try:
         while True:
-            schedule.run_pending()
-            time.sleep(5)
+            delay = schedule.next_delay(task())
+            print(f"Next run in {delay:.0f} seconds")
+            time.sleep(delay)
     except Exception as e:  # pylint: disable=broad-exception-caught
         print("Error in scheduler: %s", e)
         flask_process.terminate()
@@ -10,10 +10,16 @@ __Status__ = "Development"
 # ------------------------------------------------
 # ! Imports
 
+import copy
 import json
+import os
+from collections.abc import Iterator
+from typing import Any
 
 import jsonschema
 import jsonschema.exceptions
+import jsonschema.validators
+from jsonschema.exceptions import ValidationError
 
 from logger import setup_logger
 
@@ -22,7 +28,116 @@ logger = setup_logger(__name__)
 
 # ------------------------------------------------
 
-# Load the schema
+# Array in the document whose items can be validated one by one
+ITEMS_KEY = "substitution"
+
+
+class SchemaValidator:
+    """
+    A JSON schema compiled once, collecting all errors instead of stopping at the first.
+
+    The items of the document's "substitution" array are checked with their own subschema, so
+    days already validated as part of an earlier document can be skipped.
+    """
+
+    def __init__(self, schema: dict):
+        """
+        Args:
+            schema (dict): The JSON schema.
+
+        Raises:
+            jsonschema.exceptions.SchemaError: If the schema itself is invalid.
+        """
+        validator_class = jsonschema.validators.validator_for(schema)
+        validator_class.check_schema(schema)
+        self.validator = validator_class(schema)
+
+        # Split off the item schema, if the schema has the expected layout
+        self.item_validator = None
+        self.shell_validator = None
+        items_schema = schema.get("properties", {}).get(ITEMS_KEY, {})
+        if isinstance(items_schema.get("items"), dict):
+            shell = copy.deepcopy(schema)
+            del shell["properties"][ITEMS_KEY]["items"]
+            self.shell_validator = self.validator.evolve(schema=shell)
+            self.item_validator = self.validator.evolve(schema=items_schema["items"])
+
+    def iter_errors(self, json_data: Any,
+                    previous: dict | None = None) -> Iterator[ValidationError]:
+        """
+        Yield every validation error of a document.
+
+        Args:
+            json_data (Any): The decoded document.
+            previous (dict | None): A document known to be valid. Items equal to one of its
+                items are not validated again.
+
+        Yields:
+            ValidationError: The errors, with paths relative to the document.
+        """
+        items = json_data.get(ITEMS_KEY) if isinstance(json_data, dict) else None
+        if self.item_validator is None or not isinstance(items, list):
+            yield from self.validator.iter_errors(json_data)
+            return
+
+        yield from self.shell_validator.iter_errors(json_data)
+
+        known = previous.get(ITEMS_KEY, []) if isinstance(previous, dict) else []
+        for index, item in enumerate(items):
+            if item in known:
+                continue
+            for error in self.item_validator.iter_errors(item):
+                error.path.extendleft((index, ITEMS_KEY))
+                yield error
+
+
+# Compiled validators by schema file, recompiled when the file changes
+_validators: dict[str, tuple[int, SchemaValidator]] = {}
+
+
+def load_validator(schema_file: str) -> SchemaValidator:
+    """
+    Return the compiled validator of a schema file, compiling it only on first use.
+
+    Args:
+        schema_file (str): The path to the JSON schema file.
+
+    Returns:
+        SchemaValidator: The compiled validator.
+    """
+    mtime = os.stat(schema_file).st_mtime_ns
+    cached = _validators.get(schema_file)
+    if cached is None or cached[0] != mtime:
+        with open(schema_file, 'r', encoding='utf-8') as schema_file_content:
+            schema = json.load(schema_file_content)
+        cached = (mtime, SchemaValidator(schema))
+        _validators[schema_file] = cached
+    return cached[1]
+
+
+def validate(json_data, schema_file, previous=None):
+    """
+    Validates data against a provided JSON schema and logs every error found.
+
+    Args:
+        json_data (Any): The decoded JSON data to be validated.
+        schema_file (str): The path to the JSON schema file.
+        previous (dict | None): A previously validated document. Days equal to one of its days
+            are not validated again.
+
+    Raises:
+        jsonschema.exceptions.ValidationError: The most relevant error, if the data does not
+            match the schema.
+    """
+    errors = list(load_validator(schema_file).iter_errors(json_data, previous))
+    if not errors:
+        logger.info("JSON file is valid.")
+        return
+
+    logger.error("JSON file is invalid: %s error(s).", len(errors))
+    for error in errors:
+        logger.error("  %s: %s", error.json_path, error.message)
+    raise jsonschema.exceptions.best_match(errors)
 
 
 def main(schema_file, json_file):
@@ -33,20 +148,11 @@ def main(schema_file, json_file):
         schema_file (str): The path to the JSON schema file.
         json_file (str): The path to the JSON file to be validated.
     """
-    with open(schema_file, 'r', encoding='utf-8') as schema_file_content:
-        schema = json.load(schema_file_content)
-
     # Load the JSON file to be validated
     with open(json_file, 'r', encoding='utf-8') as json_file_content:
         json_data = json.load(json_file_content)
 
-    # Validate the JSON file against the schema
-    try:
-        jsonschema.validate(instance=json_data, schema=schema)
-        logger.info("JSON file is valid.")
-    except jsonschema.exceptions.ValidationError:
-        logger.error("JSON file is invalid.")
-        raise
+    validate(json_data, schema_file)
 
 
 if __name__ == "__main__":
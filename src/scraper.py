@@ -14,19 +14,91 @@ __Status__ = "Development"
 import argparse
 import json
 import logging
+import os
+import re
+import time
+from collections.abc import Callable, Hashable, Iterable
+from concurrent.futures import ThreadPoolExecutor
 from os import getenv
+from typing import TypeVar
 from urllib.parse import urljoin
 
 import requests
 from bs4 import BeautifulSoup
 from dotenv import dotenv_values
 
+import http_session
+import json_io
+import metrics
+import profiler
+import table_parser
+from http_cache import FetchResult, ValidatorCache
+from http_session import get_session
 from logger import setup_logger
-from PyDSB import PyDSB
+from PyDSB import PyDSB, TokenCache
 
 # Initialize logger
 logger = setup_logger(__name__)
 
+# Maximum number of day pages fetched concurrently
+DEFAULT_WORKERS = int(getenv("DSB_WORKERS", "4"))
+
+# Parse day pages while they download (see stream_courses)
+STREAMING = getenv("DSB_STREAMING", "").lower() in ("1", "true", "yes")
+
+T = TypeVar("T")
+
+# DSB tokens, reused until they expire or are rejected. Set DSB_TOKEN_CACHE to persist them.
+TOKEN_CACHE = TokenCache(getenv("DSB_TOKEN_CACHE"), ttl=float(getenv("DSB_TOKEN_TTL", "3600")))
+
+# Validators and parse results of previously fetched pages, kept across scheduler cycles
+HTTP_CACHE = ValidatorCache()
+
+
+class DiscoveryCache:
+    """
+    The DaVinci Touch URL and its day index, the URL reused for at most `ttl` seconds.
+
+    While valid, a cycle skips authentication and the postings request. The index page is still
+    revalidated every cycle (a 304 in the usual case), and the day index is replaced as soon as
+    the index content changes, e.g. when the days roll over. A day page answering 404 or a
+    failing index page invalidates the cache.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.base_url: str | None = None
+        self.posts_dict: dict[str, str] = {}
+        self.index_digest: str | None = None
+        self.expires_at = 0.0
+
+    def valid(self) -> bool:
+        """Return whether the cached day index can be used."""
+        return self.base_url is not None and time.monotonic() < self.expires_at
+
+    def store(self, base_url: str, posts_dict: dict[str, str], index_digest: str | None) -> None:
+        """Remember a freshly discovered DaVinci Touch URL and its day index."""
+        self.base_url = base_url
+        self.expires_at = time.monotonic() + self.ttl
+        self.update(posts_dict, index_digest)
+
+    def update(self, posts_dict: dict[str, str], index_digest: str | None) -> None:
+        """Replace the day index after revalidating the index page, keeping the expiry."""
+        if self.index_digest is not None and index_digest != self.index_digest:
+            logger.info("Day index changed")
+        self.posts_dict = posts_dict
+        self.index_digest = index_digest
+
+    def invalidate(self) -> None:
+        """Force the next cycle to discover the day index again."""
+        self.expires_at = 0.0
+
+
+DISCOVERY_CACHE = DiscoveryCache(float(getenv("DSB_DISCOVERY_TTL", "900")))
+
+# Hash of the data last saved to each raw file, see data_changed()
+LAST_SAVED: dict[str, str | None] = {}
+
 
 def load_env_credentials() -> dict[str, str | None]:
     """
@@ -104,6 +176,7 @@ def prepare_api_url(credentials: dict[str, str | None]) -> str:
 
     Raises:
         KeyError: If a required credential is missing.
+        PyDSBError: If the credentials are rejected or the API returns no postings.
         ValueError: If the "DaVinci Touch" section is not found.
         Exception: For other unforeseen errors.
     """
@@ -111,9 +184,13 @@ def prepare_api_url(credentials: dict[str, str | None]) -> str:
     logger.info("Sending API request")
 
     try:
-        dsb = PyDSB(credentials["DSB_USERNAME"],  # type: ignore
-                    credentials["DSB_PASSWORD"])  # type: ignore
-        data = dsb.get_postings()
+        with metrics.timed("auth"):
+            dsb = PyDSB(credentials["DSB_USERNAME"],  # type: ignore
+                        credentials["DSB_PASSWORD"],  # type: ignore
+                        session=get_session(), token_cache=TOKEN_CACHE,
+                        timeout=http_session.TIMEOUT)
+        with metrics.timed("postings"):
+            data = dsb.get_postings()
 
     except requests.ConnectionError as e:
         logger.critical("No Internet Connection: %s", e)
@@ -129,49 +206,88 @@ def prepare_api_url(credentials: dict[str, str | None]) -> str:
     raise ValueError("DaVinci Touch section not found.")
 
 
-def request_url_data(url: str) -> BeautifulSoup:
+def fetch_url(url: str) -> FetchResult:
     """
-    Send a GET request to the specified URL and return a BeautifulSoup object parsed from the
-    HTML response.
+    Send a conditional GET request to the specified URL through the validator cache.
 
     Args:
         url (str): The URL to send the request to.
 
     Returns:
-        BeautifulSoup: A BeautifulSoup object of the parsed HTML document.
+        FetchResult: The response body and whether it changed since the last fetch.
 
     Raises:
         requests.exceptions.RequestException: If the request fails for any reason, including
         network issues, invalid URLs, or HTTP errors.
     """
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()  # Raises HTTPError for bad responses
+        return HTTP_CACHE.fetch(get_session(), url, http_session.TIMEOUT)
     except requests.exceptions.RequestException as e:
         logger.error("Failed to fetch data from %s: %s", url, e)
         raise
 
-    html = response.content.decode("utf-8")
-    soup = BeautifulSoup(html, "html.parser")
-    return soup
 
+def fetch_parsed(url: str, parse: Callable[[bytes], T], key: Hashable = None) -> T:
+    """
+    Fetch the specified URL and parse its body, skipping the parse if the body is unchanged.
 
-def get_plans(base_url: str) -> dict[str, str]:
+    Args:
+        url (str): The URL to send the request to.
+        parse (Callable[[bytes], T]): Turns the response body into the result.
+        key (Hashable): Distinguishes different parse functions applied to the same URL.
+
+    Returns:
+        T: The parse result, possibly shared with earlier calls.
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails.
     """
-    Extract plans from the given base URL and organize them in a dictionary.
+    try:
+        return HTTP_CACHE.fetch_parsed(get_session(), url, parse, key, http_session.TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        logger.error("Failed to fetch data from %s: %s", url, e)
+        raise
+
+
+def parse_html(content: bytes) -> BeautifulSoup:
+    """Parse a UTF-8 encoded HTML document."""
+    html = content.decode("utf-8")
+    return BeautifulSoup(html, "html.parser")
+
+
+def request_url_data(url: str) -> BeautifulSoup:
+    """
+    Send a GET request to the specified URL and return a BeautifulSoup object parsed from the
+    HTML response.
 
     Args:
-        base_url (str): The base URL containing the plan information.
+        url (str): The URL to send the request to.
+
+    Returns:
+        BeautifulSoup: A BeautifulSoup object of the parsed HTML document.
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails for any reason, including
+        network issues, invalid URLs, or HTTP errors.
+    """
+    return parse_html(fetch_url(url).content)
+
+
+def parse_plans(base_url: str, content: bytes) -> dict[str, str]:
+    """
+    Parse the day index page into a dictionary of plan URLs.
+
+    Args:
+        base_url (str): The URL of the index page, used to resolve relative links.
+        content (bytes): The body of the index page.
 
     Returns:
         dict: A dictionary mapping plan identifiers to their URLs.
-            e.g. {'1_Montag': 'https://light.dsbcontrol.de/DSBlightWebsite/Data/{id}/V_DC_001.html'}
 
     Raises:
         ValueError: If the expected HTML structure is not found.
     """
-    logger.info("Extracting Posts")
-    soup = request_url_data(base_url)
+    soup = parse_html(content)
 
     try:
         # Find all <a> tags within the <ul> element with class "day-index"
@@ -209,13 +325,228 @@ def get_plans(base_url: str) -> dict[str, str]:
     return posts_dict
 
 
-def main_scraping(url: str, course: str) -> tuple[list[list[str]], bool]:
+def get_plans(base_url: str) -> dict[str, str]:
+    """
+    Extract plans from the given base URL and organize them in a dictionary.
+
+    The index page is only parsed again if its content changed since the last call.
+
+    Args:
+        base_url (str): The base URL containing the plan information.
+
+    Returns:
+        dict: A dictionary mapping plan identifiers to their URLs.
+            e.g. {'1_Montag': 'https://light.dsbcontrol.de/DSBlightWebsite/Data/{id}/V_DC_001.html'}
+
+    Raises:
+        ValueError: If the expected HTML structure is not found.
+    """
+    logger.info("Extracting Posts")
+    with metrics.timed("index"):
+        return fetch_parsed(base_url, lambda content: parse_plans(base_url, content), "plans")
+
+
+def discover_plans(credentials: dict[str, str | None]) -> tuple[dict[str, str], bool]:
+    """
+    Return the current day index, reusing the cached DaVinci Touch URL while it is valid.
+
+    The index page is fetched every time with a conditional request, so a changed index is
+    never served from the cache; an unchanged one costs a 304 and no parsing.
+
+    Args:
+        credentials (dict): Dictionary containing 'username' and 'password' for authentication.
+
+    Returns:
+        tuple[dict[str, str], bool]: The mapping of plan identifiers to URLs as returned by
+            get_plans(), and whether the DaVinci Touch URL came from the cache.
+    """
+    if DISCOVERY_CACHE.valid():
+        base_url = DISCOVERY_CACHE.base_url
+        try:
+            posts_dict = get_plans(base_url)  # type: ignore[arg-type]
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning("Cached day index is unavailable, discovering it again: %s", e)
+            DISCOVERY_CACHE.invalidate()
+        else:
+            logger.info("Using cached DaVinci Touch URL")
+            metrics.inc("dsb_cache_lookups_total", cache="discovery", result="hit")
+            DISCOVERY_CACHE.update(posts_dict, HTTP_CACHE.digest(base_url))  # type: ignore[arg-type]
+            return posts_dict, True
+    metrics.inc("dsb_cache_lookups_total", cache="discovery", result="miss")
+
+    base_url: str = prepare_api_url(credentials)
+    posts_dict: dict[str, str] = get_plans(base_url)
+    DISCOVERY_CACHE.store(base_url, posts_dict, HTTP_CACHE.digest(base_url))
+    return posts_dict, False
+
+
+def scrape_plans(credentials: dict[str, str | None],
+                 scrape: Callable[[dict[str, str]], T]) -> T:
+    """
+    Discover the day index and scrape it.
+
+    If a cached day index turns out to be outdated because a day page is gone, the index is
+    discovered again and the scrape is repeated once, also if every day page failed.
+
+    Args:
+        credentials (dict): Dictionary containing 'username' and 'password' for authentication.
+        scrape (Callable[[dict[str, str]], T]): Scrapes the day pages of a day index.
+
+    Returns:
+        T: The result of scrape.
+
+    Raises:
+        ScrapeError: If every day page failed, after discovering the index again if it was cached.
+    """
+    posts_dict, cached = discover_plans(credentials)
+    try:
+        result = scrape(posts_dict)
+    except ScrapeError:
+        if not cached or DISCOVERY_CACHE.valid():
+            raise
+
+    if cached and not DISCOVERY_CACHE.valid():
+        logger.warning("Cached day index is outdated, discovering it again")
+        posts_dict, _ = discover_plans(credentials)
+        result = scrape(posts_dict)
+    return result
+
+
+def extract_courses(rows: Iterable[list[str]], courses: set[str] | None = None,
+                    stop_early: bool = False) -> dict[str, list[list[str]]]:
+    """
+    Collect the table rows of several courses in a single pass.
+
+    A course block starts with a row whose first cell equals the course name and continues with
+    the directly following rows whose first cell contains a non-breaking space.
+
+    Args:
+        rows (Iterable[list[str]]): Raw (unstripped) cell texts per row, as returned by
+            table_parser.parse_table().
+        courses (set[str] | None): The courses to collect. None collects every course.
+        stop_early (bool): Stop consuming rows once the block of every requested course has
+            ended. This assumes each course appears in one contiguous block, as in DaVinci plans.
+
+    Returns:
+        dict[str, list[list[str]]]: The stripped rows of each course found, keyed by course in
+            order of appearance.
+    """
+    found: dict[str, list[list[str]]] = {}
+    current: str | None = None
+    pending = set(courses) if stop_early and courses is not None else None
+    parsed = 0
+
+    for cells in rows:
+        parsed += 1
+        if current is not None and cells and "\xa0" in cells[0]:
+            logger.debug("New row found for %s", current)
+            found[current].append([cell.strip() for cell in cells])
+            continue
+
+        # The block of the current course ends here
+        if pending is not None and current is not None:
+            pending.discard(current)
+            if not pending:
+                logger.debug("All requested courses complete, stopping early")
+                break
+
+        name = cells[0].strip() if cells else ""
+        if name and (courses is None or name in courses):
+            logger.debug("%s found", name)
+            current = name
+            found.setdefault(name, []).append([cell.strip() for cell in cells])
+        else:
+            current = None
+
+    metrics.inc("dsb_parsed_rows_total", parsed)
+    return found
+
+
+def stream_courses(url: str, courses: set[str] | None = None) -> dict[str, list[list[str]]]:
+    """
+    Scrape a given URL for the table data of several courses while it is being downloaded.
+
+    Rows are tokenized from the response chunks as they arrive, and the download is abandoned
+    as soon as the blocks of all requested courses are complete. This only saves time for
+    courses near the top of the table. The request is conditional as in fetch_parsed(), so an
+    unchanged page returns the previous result without downloading or parsing it.
+
+    Args:
+        url (str): The URL to scrape data from.
+        courses (set[str] | None): The course identifiers to search for. None reads the whole
+            table and returns every course.
+
+    Returns:
+        dict[str, list[list[str]]]: The scraped table data keyed by course.
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails.
+        ValueError: If the table element is not found in the HTML.
+    """
+    def parse(chunks: Iterable[bytes]) -> dict[str, list[list[str]]]:
+        try:
+            return extract_courses(table_parser.iter_table_rows(chunks), courses, stop_early=True)
+        except Exception as e:
+            logger.error("Error processing HTML: %s", e)
+            raise
+
+    try:
+        return HTTP_CACHE.fetch_streamed(
+            get_session(), url, parse, frozenset(courses) if courses is not None else None,
+            http_session.TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        logger.error("Failed to fetch data from %s: %s", url, e)
+        raise
+
+
+def main_scraping_courses(url: str, courses: set[str] | None = None,
+                          stream: bool = False) -> dict[str, list[list[str]]]:
+    """
+    Scrape a given URL for the table data of several courses at once.
+
+    Args:
+        url (str): The URL to scrape data from.
+        courses (set[str] | None): The course identifiers to search for. None returns every course
+            found in the table.
+        stream (bool): Parse the page while it is downloading and stop early, see
+            stream_courses().
+
+    Returns:
+        dict[str, list[list[str]]]: The scraped table data keyed by course. Courses that were not
+            found are missing from the result. If the page did not change since the last call,
+            the previous result is returned without parsing.
+
+    Raises:
+        ValueError: If the table element is not found in the HTML.
+        Exception: If any other error occurs during HTML processing.
+    """
+    with metrics.timed("day_page"):
+        if stream:
+            return stream_courses(url, courses)
+
+        def parse(content: bytes) -> dict[str, list[list[str]]]:
+            try:
+                with metrics.timed("parse"):
+                    rows = table_parser.parse_table(content)
+                    if rows is None:
+                        raise ValueError("Table element not found in the HTML.")
+
+                    return extract_courses(rows, courses)
+            except Exception as e:
+                logger.error("Error processing HTML: %s", e)
+                raise
+
+        return fetch_parsed(url, parse, frozenset(courses) if courses is not None else None)
+
+
+def main_scraping(url: str, course: str, stream: bool = False) -> tuple[list[list[str]], bool]:
     """
     Scrape a given URL for specific table data related to a course.
 
     Args:
         url (str): The URL to scrape data from.
         course (str): The course identifier to search for in the table.
+        stream (bool): Parse the page while it is downloading and stop after the course block.
 
     Returns:
         tuple[list[list[str]], bool]: A tuple containing:
@@ -226,43 +557,68 @@ def main_scraping(url: str, course: str) -> tuple[list[list[str]], bool]:
         ValueError: If the table element is not found in the HTML.
         Exception: If any other error occurs during HTML processing.
     """
-
-    soup = request_url_data(url)
-    success = False
-    total_replacements = []
-
-    try:
-        table = soup.find("table")
-        if not table:
-            raise ValueError("Table element not found in the HTML.")
-
-        for row in table.find_all("tr"):  # type: ignore
-            columns = row.find_all("td")
-            if columns and columns[0].get_text().strip() == course:
-                success = True
-                logger.debug("%s found", course)
-                replacement = [col.get_text().strip() for col in columns]
-                total_replacements.append(replacement)
-
-                next_row = row.find_next_sibling("tr")
-                count = 1
-                while next_row and "\xa0" in next_row.find("td").get_text():
-                    logger.debug("New row found! %s", count)
-                    replacement = [
-                        col.get_text().strip() for col in next_row.find_all("td")
-                    ]
-                    total_replacements.append(replacement)
-                    next_row = next_row.find_next_sibling("tr")
-                    count += 1
-    except Exception as e:
-        logger.error("Error processing HTML: %s", e)
-        raise
+    total_replacements = main_scraping_courses(url, {course}, stream).get(course, [])
+    success = bool(total_replacements)
     logger.debug("Success Status: %s", success)
     return total_replacements, success
 
 
-def run_main_scraping(posts_dict: dict[str, str],
-                      course: str | None, print_output: bool) -> dict[str, list[list[str]]]:
+class ScrapeError(Exception):
+    """Raised when every day page of a cycle failed, so there is no data to compare or save."""
+
+
+def check_any_scraped(results: dict[str, object]) -> None:
+    """
+    Fail the cycle if no day page could be scraped.
+
+    Failed pages count as empty days, which is fine for a few of them, but would replace the
+    whole plan with an empty one if DSB is unreachable.
+
+    Raises:
+        ScrapeError: If there were day pages and every one of them failed.
+    """
+    if results and all(isinstance(result, Exception) for result in results.values()):
+        raise ScrapeError(f"All {len(results)} day pages failed")
+
+
+def log_scrape_failure(url: str, error: Exception) -> None:
+    """Log a failed day page and invalidate the discovery cache if the page is gone."""
+    logger.error("Failed to scrape %s: %s", url, error)
+    if (isinstance(error, requests.HTTPError) and error.response is not None
+            and error.response.status_code == 404):
+        DISCOVERY_CACHE.invalidate()
+
+
+def scrape_pages(posts_dict: dict[str, str], scrape: Callable[[str], T],
+                 workers: int = 1) -> dict[str, T | Exception]:
+    """
+    Call scrape for every URL in the given dictionary, fetching up to `workers` pages at once.
+
+    Args:
+        posts_dict (dict[str, str]): A dictionary mapping identifiers to URLs.
+        scrape (Callable[[str], T]): The function to call with each URL.
+        workers (int): The maximum number of concurrent requests. 1 scrapes sequentially.
+
+    Returns:
+        dict[str, T | Exception]: The result for each identifier, in the order of posts_dict.
+            A failed page maps to the exception it raised.
+    """
+    def scrape_isolated(url: str) -> T | Exception:
+        try:
+            return scrape(url)
+        except Exception as e:  # pylint: disable=W0718
+            return e
+
+    if workers <= 1 or len(posts_dict) <= 1:
+        return {key: scrape_isolated(url) for key, url in posts_dict.items()}
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(posts_dict))) as executor:
+        task = profiler.in_thread(scrape_isolated)
+        return dict(zip(posts_dict, executor.map(task, posts_dict.values())))
+
+
+def run_main_scraping(posts_dict: dict[str, str], course: str | None, print_output: bool,
+                      workers: int = 1, stream: bool = False) -> dict[str, list[list[str]]]:
     """
     Execute the main_scraping function for each URL in the given dictionary.
 
@@ -270,30 +626,37 @@ def run_main_scraping(posts_dict: dict[str, str],
         posts_dict (dict[str, str]): A dictionary mapping identifiers to URLs.
         course (str | None): The course identifier to search for in the tables.
         print_output (bool): Whether to print the scraped data to console.
+        workers (int): The maximum number of day pages to fetch concurrently.
+        stream (bool): Parse each page while it is downloading, see stream_courses().
 
     Returns:
         dict[str, list[list[str]]]: Dictionary mapping identifiers to the scraped data for each URL.
 
     Raises:
         ValueError: If the course argument is None.
+        ScrapeError: If every day page failed.
     """
     if course is None:
         logger.error("Course argument must have a string value if provided")
         raise ValueError(
             "Course argument must have a string value if provided")
 
+    results = scrape_pages(posts_dict, lambda url: main_scraping(url, course, stream), workers)
+
     scrape_dict = {}
-    for key, url in posts_dict.items():
-        try:
-            scraped_data, success = main_scraping(url, course)
-            scrape_dict[key] = scraped_data
-            if success:
-                logger.info("%s: found %s entries!", key, course)
-            else:
-                logger.warning("%s: class %s not found!", key, course)
-        except Exception as e:  # pylint: disable=W0718
-            logger.error("Failed to scrape %s: %s", url, e)
+    for key, result in results.items():
+        if isinstance(result, Exception):
+            log_scrape_failure(posts_dict[key], result)
             scrape_dict[key] = []  # Assign an empty list in case of failure
+            continue
+
+        scraped_data, success = result
+        scrape_dict[key] = scraped_data
+        if success:
+            logger.info("%s: found %s entries!", key, course)
+        else:
+            logger.warning("%s: class %s not found!", key, course)
+    check_any_scraped(results)
     if print_output:
         logger.info(
             "%s",
@@ -303,32 +666,125 @@ def run_main_scraping(posts_dict: dict[str, str],
         )
     return scrape_dict
 
-# TODO: also check json/formatted.json
 
+def parse_courses(values: list[str]) -> list[str] | None:
+    """
+    Normalize a course selection from the command line or the environment.
 
-def save_data_if_changed(new_data: dict, file_path: str) -> bool:
+    Args:
+        values (list[str]): Course identifiers, optionally comma separated. "all" selects every
+            course.
+
+    Returns:
+        list[str] | None: The requested courses without duplicates, or None for all courses.
     """
-    Compare new data with existing file content and save if different.
+    courses = [course.strip() for value in values for course in value.split(",")]
+    courses = [course for course in courses if course]
+    if not courses or any(course.lower() == "all" for course in courses):
+        return None
+    return list(dict.fromkeys(courses))
+
+
+def course_file_path(file_path: str, course: str) -> str:
     """
-    try:
-        with open(file_path, 'r', encoding='utf8') as file:
-            existing_data = json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        existing_data = None
+    Derive the per-course variant of an output path.
+
+    e.g. ("json/scraped.json", "MSS12") -> "json/scraped_MSS12.json"
+    """
+    root, ext = os.path.splitext(file_path)
+    safe_course = re.sub(r"[^\w-]", "_", course)
+    return f"{root}_{safe_course}{ext}"
+
+
+def run_multi_course_scraping(posts_dict: dict[str, str], courses: list[str] | None,
+                              print_output: bool, workers: int = 1,
+                              stream: bool = False) -> dict[str, dict[str, list[list[str]]]]:
+    """
+    Scrape several courses with a single download and parse per day page.
+
+    Args:
+        posts_dict (dict[str, str]): A dictionary mapping identifiers to URLs.
+        courses (list[str] | None): The course identifiers to collect, or None for all courses.
+        print_output (bool): Whether to print the scraped data to console.
+        workers (int): The maximum number of day pages to fetch concurrently.
+        stream (bool): Parse each page while it is downloading, see stream_courses().
+
+    Returns:
+        dict[str, dict[str, list[list[str]]]]: The scraped data keyed by course, each in the same
+            format as run_main_scraping() returns for a single course.
+
+    Raises:
+        ScrapeError: If every day page failed.
+    """
+    wanted = set(courses) if courses is not None else None
+    results = scrape_pages(
+        posts_dict, lambda url: main_scraping_courses(url, wanted, stream), workers)
+
+    day_dict: dict[str, dict[str, list[list[str]]]] = {}
+    for key, result in results.items():
+        if isinstance(result, Exception):
+            log_scrape_failure(posts_dict[key], result)
+            day_dict[key] = {}  # Every course gets an empty list in case of failure
+            continue
+
+        day_dict[key] = result
+        logger.info("%s: found entries for %s course(s)", key, len(result))
+    check_any_scraped(results)
+
+    if courses is None:
+        courses = list(dict.fromkeys(course for day in day_dict.values() for course in day))
+
+    course_dict = {
+        course: {key: day.get(course, []) for key, day in day_dict.items()}
+        for course in courses
+    }
+    for course, scrape_dict in course_dict.items():
+        if not any(scrape_dict.values()):
+            logger.warning("class %s not found on any day!", course)
+
+    if print_output:
+        logger.info("%s", json.dumps(course_dict, indent=2, ensure_ascii=False))
+    return course_dict
+
+
+def data_changed(new_data: dict, file_path: str) -> bool:
+    """
+    Compare new data with the data last saved to a file.
 
-    if existing_data == new_data:
+    Only hashes of the serialized data are compared, so the old file is never decoded; it is
+    read once to hash it on the first comparison.
+    """
+    if file_path not in LAST_SAVED:
+        LAST_SAVED[file_path] = json_io.file_digest(file_path)
+
+    if LAST_SAVED[file_path] == json_io.digest(json_io.dumps(new_data)):
         logger.debug("No changes detected in scraped data. Aborting.")
         return False
+    return True
+
 
-    with open(file_path, "w", encoding="utf8") as file_json:
-        json.dump(new_data, file_json, ensure_ascii=False)
+def save_data(data: dict, file_path: str) -> None:
+    """Save scraped data atomically and remember its hash for data_changed()."""
+    LAST_SAVED[file_path] = json_io.write_json(file_path, data, pretty=False)
     logger.info("Scraped data saved to %s", file_path)
+
+
+def save_data_if_changed(new_data: dict, file_path: str) -> bool:
+    """
+    Compare new data with existing file content and save if different.
+    """
+    if not data_changed(new_data, file_path):
+        return False
+    save_data(new_data, file_path)
     return True
 
 
-def main(args: argparse.Namespace) -> bool:
+def scrape_data(args: argparse.Namespace) -> dict[str, list[list[str]]]:
     """
-    Main function that orchestrates the scraping process.
+    Scrape the plans of args.course without saving them.
+
+    Returns:
+        dict[str, list[list[str]]]: The scraped rows keyed by day.
     """
     # Setup logger
     setup_logger(__name__, logging.DEBUG if args.verbose else logging.INFO)
@@ -337,22 +793,55 @@ def main(args: argparse.Namespace) -> bool:
     # Load environment credentials
     env_credentials: dict[str, str | None] = load_env_credentials()
 
-    # Prepare API URL
-    base_url: str = prepare_api_url(env_credentials)
+    # Get plans and scrape data
+    return scrape_plans(
+        env_credentials,
+        lambda posts_dict: run_main_scraping(
+            posts_dict, args.course, args.print_output, args.workers, args.stream))
 
-    # Get plans
-    posts_dict: dict[str, str] = get_plans(base_url)
 
-    # Scrape data
-    class_dict: dict[str, list[list[str]]] = run_main_scraping(
-        posts_dict, args.course, args.print_output)
+def scrape_multi_course(args: argparse.Namespace) -> dict[str, dict[str, list[list[str]]]]:
+    """
+    Scrape every course in args.courses without saving them.
+
+    Returns:
+        dict[str, dict[str, list[list[str]]]]: The scraped rows keyed by course and day.
+    """
+    setup_logger(__name__, logging.DEBUG if args.verbose else logging.INFO)
+    logger.info("Script started successfully")
+
+    env_credentials: dict[str, str | None] = load_env_credentials()
+    courses = parse_courses(args.courses)
+    return scrape_plans(
+        env_credentials,
+        lambda posts_dict: run_multi_course_scraping(
+            posts_dict, courses, args.print_output, args.workers, args.stream))
+
 
+def main(args: argparse.Namespace) -> bool:
+    """
+    Main function that orchestrates the scraping process.
+    """
     # Save data if changed
-    return save_data_if_changed(class_dict, args.raw_file)
+    return save_data_if_changed(scrape_data(args), args.raw_file)
+
+
+def main_multi_course(args: argparse.Namespace) -> dict[str, bool]:
+    """
+    Scrape every course in args.courses and save one raw file per course.
+
+    Returns:
+        dict[str, bool]: Whether the data changed, keyed by course.
+    """
+    return {
+        course: save_data_if_changed(scrape_dict, course_file_path(args.raw_file, course))
+        for course, scrape_dict in scrape_multi_course(args).items()
+    }
 
 
 if __name__ == "__main__":
     # DEFAULT VALUES
-    default_args = argparse.Namespace(verbose=False, course='MSS12',
-                                      print_output=False, raw_file='json/scraped.json')
+    default_args = argparse.Namespace(verbose=False, course='MSS12', print_output=False,
+                                      raw_file='json/scraped.json', workers=DEFAULT_WORKERS,
+                                      stream=STREAMING)
     main(default_args)
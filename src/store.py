@@ -0,0 +1,238 @@
+"""In-memory store of the formatted substitution document served by the API."""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+import http_compression
+import json_io
+from diff import diff_documents
+from index import SubstitutionIndex
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+EMPTY_DOCUMENT: dict[str, Any] = {"substitution": []}
+# Version of the empty document, also usable as the base of a diff to get every entry as added
+EMPTY_VERSION = "empty"
+
+# Seconds between file checks while waiting for a new version
+POLL_INTERVAL = 1.0
+
+# Number of recent versions kept for diffs
+HISTORY_SIZE = int(os.getenv("API_VERSION_HISTORY", "20"))
+
+
+class Snapshot:
+    """
+    One version of the document together with the responses serialized from it.
+
+    Attributes:
+        data (dict): The decoded document. Must not be modified.
+        version (str): Short content hash identifying this version.
+        serialized (dict): Response bodies already serialized from this version, keyed by
+            endpoint and content encoding.
+        diffs (dict): Diffs from earlier versions to this one, keyed by the earlier version.
+        index (SubstitutionIndex): Filter indexes over the entries of this version.
+    """
+
+    def __init__(self, data: dict[str, Any], version: str):
+        self.data = data
+        self.version = version
+        self.serialized: dict[tuple[Hashable, str | None], bytes] = {}
+        self.diffs: dict[str, dict[str, Any]] = {}
+        self.index = SubstitutionIndex(data)
+
+
+class DataStore:
+    """
+    Keep the formatted document in memory and reload it only when its file changes.
+
+    Every access compares the file's inode, mtime and size with the loaded version, so a new
+    file written by the scraper is picked up on the next request. In-process producers can hand
+    over a new document directly with publish(). wait_for_change() blocks until a new version
+    appears either way. The last HISTORY_SIZE versions are kept for diff().
+    """
+
+    def __init__(self, path: str, dumps: Callable[[Any], bytes]):
+        """
+        Args:
+            path (str): Path of the formatted JSON document.
+            dumps (Callable[[Any], bytes]): Serializer for response bodies.
+        """
+        self.path = path
+        self.dumps = dumps
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._file_key: tuple[int, int, int] | None = None
+        self._empty = Snapshot(EMPTY_DOCUMENT, EMPTY_VERSION)
+        self._snapshot = self._empty
+        self._history: OrderedDict[str, Snapshot] = OrderedDict()
+
+    def _stat(self) -> tuple[int, int, int] | None:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> Snapshot:
+        try:
+            with open(self.path, "rb") as file:
+                content = file.read()
+            data = json_io.loads(content)
+        except FileNotFoundError:
+            logger.info("Error: The file '%s' was not found.", self.path)
+            return Snapshot(EMPTY_DOCUMENT, EMPTY_VERSION)
+        except (OSError, ValueError):
+            logger.info("Error: Failed to decode JSON from '%s'.", self.path)
+            return self._snapshot
+        return Snapshot(data, hashlib.sha256(content).hexdigest()[:16])
+
+    def snapshot(self) -> Snapshot:
+        """Return the current version, reloading the file first if it changed."""
+        file_key = self._stat()
+        if file_key != self._file_key:
+            with self._lock:
+                if file_key != self._file_key:
+                    previous = self._snapshot
+                    self._snapshot = self._load()
+                    self._file_key = file_key
+                    logger.info("Loaded %s (version %s)", self.path, self._snapshot.version)
+                    if self._snapshot.version != previous.version:
+                        self._remember(self._snapshot)
+                        self._changed.notify_all()
+        return self._snapshot
+
+    @property
+    def data(self) -> dict[str, Any]:
+        """The current document."""
+        return self.snapshot().data
+
+    def publish(self, data: dict[str, Any]) -> Snapshot:
+        """
+        Replace the document in memory without going through the file.
+
+        Args:
+            data (dict): The new formatted document.
+
+        Returns:
+            Snapshot: The published version.
+        """
+        body = self.dumps(data)
+        snapshot = Snapshot(data, hashlib.sha256(body).hexdigest()[:16])
+        with self._lock:
+            self._snapshot = snapshot
+            self._file_key = self._stat()
+            self._remember(snapshot)
+            self._changed.notify_all()
+        return snapshot
+
+    def _remember(self, snapshot: Snapshot) -> None:
+        """Add a version to the history, dropping the oldest beyond HISTORY_SIZE."""
+        self._history[snapshot.version] = snapshot
+        self._history.move_to_end(snapshot.version)
+        while len(self._history) > HISTORY_SIZE:
+            self._history.popitem(last=False)
+
+    def diff(self, from_version: str, to_version: str | None = None) -> dict[str, Any]:
+        """
+        Return the changes between two versions of the history, computed once per pair.
+
+        Args:
+            from_version (str): The earlier version. EMPTY_VERSION diffs against an empty
+                document, so every entry of the later version is added.
+            to_version (str | None): The later version. Defaults to the current version.
+
+        Returns:
+            dict: The diff from diff.diff_documents() with "from" and "to" versions added.
+
+        Raises:
+            KeyError: If a version is not (or no longer) in the history.
+        """
+        current = self.snapshot()
+        target = current if to_version in (None, current.version) else self._version(to_version)
+        source = self._version(from_version)
+
+        result = target.diffs.get(from_version)
+        if result is None:
+            result = {"from": source.version, "to": target.version,
+                      **diff_documents(source.data, target.data)}
+            target.diffs[from_version] = result
+        return result
+
+    def _version(self, version: str) -> Snapshot:
+        """Return a version from the history, or the empty document for EMPTY_VERSION."""
+        return self._empty if version == EMPTY_VERSION else self._history[version]
+
+    def watch(self, interval: float = POLL_INTERVAL) -> threading.Thread:
+        """
+        Check the file for new versions in a background thread.
+
+        Without it, versions are only noticed when a request comes in, so versions written in
+        between would be missing from the history.
+        """
+        def run():
+            while True:
+                self.snapshot()
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name="store-watch", daemon=True)
+        thread.start()
+        return thread
+
+    def wait_for_change(self, since: str | None, timeout: float) -> Snapshot:
+        """
+        Block until the version differs from `since` or the timeout expires.
+
+        Args:
+            since (str | None): The version the caller already has. None returns immediately.
+            timeout (float): Maximum number of seconds to wait.
+
+        Returns:
+            Snapshot: The current version, which equals `since` if the timeout expired.
+        """
+        deadline = time.monotonic() + timeout
+        snapshot = self.snapshot()
+        while snapshot.version == since:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            with self._changed:
+                self._changed.wait(min(remaining, POLL_INTERVAL))
+            snapshot = self.snapshot()
+        return snapshot
+
+    def invalidate(self) -> None:
+        """Force the file to be read again on the next access."""
+        with self._lock:
+            self._file_key = None
+
+    def serialized(self, key: Hashable, select: Callable[[Snapshot], Any],
+                   encoding: str | None = None) -> tuple[bytes, str]:
+        """
+        Return a response body, serializing and compressing it only once per version.
+
+        Args:
+            key (Hashable): Identifies the endpoint and its arguments.
+            select (Callable): Picks the part of the snapshot to serialize, e.g. from its data
+                or its index. Exceptions such as IndexError are passed on to the caller.
+            encoding (str | None): Content encoding to compress the body with, see http_compression.
+
+        Returns:
+            tuple[bytes, str]: The serialized response body and the version it belongs to.
+        """
+        snapshot = self.snapshot()
+        body = snapshot.serialized.get((key, encoding))
+        if body is None:
+            body = snapshot.serialized.get((key, None))
+            if body is None:
+                body = self.dumps(select(snapshot))
+                snapshot.serialized[(key, None)] = body
+            if encoding is not None:
+                body = http_compression.compress(body, encoding)
+                snapshot.serialized[(key, encoding)] = body
+        return body, snapshot.version
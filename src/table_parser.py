@@ -0,0 +1,197 @@
+"""
+Parser backends that extract the rows of the first <table> of a DSB day page.
+
+Every backend returns the raw text of each <td> cell, row by row, exactly like walking the table
+with BeautifulSoup's find_all("tr") / find_all("td") / get_text(). The C-backed backends (lxml,
+selectolax) are optional and only used if installed; BeautifulSoup is always available.
+
+Select a backend with the DSB_PARSER environment variable: auto (default), lxml, selectolax or bs4.
+
+iter_table_rows() is a streaming alternative that emits rows while the page is still downloading.
+"""
+import codecs
+from collections.abc import Callable, Iterable, Iterator
+from html.parser import HTMLParser
+from os import getenv
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    SelectolaxParser = None
+
+TableRows = list[list[str]]
+
+
+def parse_table_bs4(content: bytes) -> TableRows | None:
+    """
+    Extract the table rows with BeautifulSoup and the pure-Python html.parser.
+
+    Args:
+        content (bytes): The UTF-8 encoded HTML document.
+
+    Returns:
+        TableRows | None: The raw cell texts per row, or None if the document has no table.
+    """
+    table = BeautifulSoup(content.decode("utf-8"), "html.parser").find("table")
+    if not table:
+        return None
+    return [[col.get_text() for col in row.find_all("td")]  # type: ignore
+            for row in table.find_all("tr")]  # type: ignore
+
+
+def parse_table_lxml(content: bytes) -> TableRows | None:
+    """Extract the table rows with lxml. See parse_table_bs4()."""
+    document = lxml_html.document_fromstring(  # type: ignore
+        content, parser=lxml_html.HTMLParser(encoding="utf-8"))  # type: ignore
+    table = next(document.iter("table"), None)
+    if table is None:
+        return None
+    return [[col.text_content() for col in row.iter("td")] for row in table.iter("tr")]
+
+
+def parse_table_selectolax(content: bytes) -> TableRows | None:
+    """Extract the table rows with selectolax. See parse_table_bs4()."""
+    table = SelectolaxParser(content.decode("utf-8")).css_first("table")  # type: ignore
+    if table is None:
+        return None
+    return [[col.text(deep=True) for col in row.css("td")] for row in table.css("tr")]
+
+
+BACKENDS: dict[str, Callable[[bytes], TableRows | None]] = {"bs4": parse_table_bs4}
+if lxml_html is not None:
+    BACKENDS["lxml"] = parse_table_lxml
+if SelectolaxParser is not None:
+    BACKENDS["selectolax"] = parse_table_selectolax
+
+# Preferred backends for "auto", fastest first
+AUTO_ORDER = ("selectolax", "lxml", "bs4")
+
+
+def get_backend(name: str = "auto") -> Callable[[bytes], TableRows | None]:
+    """
+    Return the parse function of a backend.
+
+    Args:
+        name (str): The backend name, or "auto" for the fastest installed backend.
+
+    Returns:
+        Callable[[bytes], TableRows | None]: The parse function.
+
+    Raises:
+        ValueError: If the backend is unknown or not installed.
+    """
+    if name == "auto":
+        name = next(backend for backend in AUTO_ORDER if backend in BACKENDS)
+    try:
+        return BACKENDS[name]
+    except KeyError as e:
+        raise ValueError(
+            f"Parser backend '{name}' is not available. Installed: {', '.join(BACKENDS)}") from e
+
+
+parse_table = get_backend(getenv("DSB_PARSER", "auto"))
+
+
+class StreamingTableParser(HTMLParser):
+    """
+    Incremental tokenizer that collects the rows of the first <table> as they are completed.
+
+    Feed it decoded chunks of the document and take finished rows with pop_rows(). Cell texts
+    match parse_table_bs4() for well-formed tables such as the ones DaVinci generates.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.table_seen = False
+        self.done = False
+        self._depth = 0
+        self._row: list[str] | None = None
+        self._cell: list[str] | None = None
+        self._rows: TableRows = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == "table":
+            self.table_seen = True
+            self._depth += 1
+        elif self._depth and tag == "tr":
+            self._end_row()
+            self._row = []
+        elif self._depth and tag == "td" and self._row is not None:
+            self._end_cell()
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if not self._depth or self.done:
+            return
+        if tag == "td":
+            self._end_cell()
+        elif tag == "tr":
+            self._end_row()
+        elif tag == "table":
+            self._depth -= 1
+            if not self._depth:
+                self._end_row()
+                self.done = True
+
+    def handle_data(self, data):
+        if self._cell is not None and not self.done:
+            self._cell.append(data)
+
+    def _end_cell(self) -> None:
+        if self._cell is not None and self._row is not None:
+            self._row.append("".join(self._cell))
+        self._cell = None
+
+    def _end_row(self) -> None:
+        self._end_cell()
+        if self._row is not None:
+            self._rows.append(self._row)
+        self._row = None
+
+    def pop_rows(self) -> TableRows:
+        """Return the rows completed since the last call."""
+        rows, self._rows = self._rows, []
+        return rows
+
+
+def iter_table_rows(chunks: Iterable[bytes]) -> Iterator[list[str]]:
+    """
+    Yield the raw cell texts of the first <table> while the document is still being received.
+
+    Reading stops at the end of the table, so the caller can stop consuming (and downloading)
+    as soon as it has the rows it needs.
+
+    Args:
+        chunks (Iterable[bytes]): The UTF-8 encoded document in chunks, e.g. from
+            requests.Response.iter_content().
+
+    Yields:
+        list[str]: The cell texts of a single row.
+
+    Raises:
+        ValueError: If the document has no table.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parser = StreamingTableParser()
+
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        yield from parser.pop_rows()
+        if parser.done:
+            return
+
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    yield from parser.pop_rows()
+
+    if not parser.table_seen:
+        raise ValueError("Table element not found in the HTML.")